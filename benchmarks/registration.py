@@ -0,0 +1,363 @@
+"""Offline load test for the event registration flow.
+
+Usage: python benchmarks/registration.py [--users 500] [--concurrency 500] [--out results.json]
+
+Drives the real callbacks from commands/event.py (RegisterButton,
+CancelRegistrationButton, /group, /export, /import) against in-process fake
+interactions, members, guilds and channels. Nothing touches the network.
+REST calls sleep for --rest-latency-ms and go through the real RestScheduler.
+
+Prints one JSON document with throughput and p50/p99 latency per step, time
+spent in blocking I/O on the event loop (roster journal writes) and in
+threads (snapshots, teams.json), and correctness checks: no lost or
+duplicated registrations, and role holders matching the roster.
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import importlib.util
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # settings.yaml is read relative to the working directory, like the bot
+os.environ.setdefault('TOKEN', 'benchmark')
+
+import discord
+from utils import settings, grouping, scheduler
+from utils.roster import Roster
+
+spec = importlib.util.spec_from_file_location('commands.event', os.path.join(ROOT, 'commands', 'event.py'))
+event = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(event)
+
+# -- fakes -----------------------------------------------------------------
+
+class FakeRole:
+    def __init__(self, role_id):
+        self.id = role_id
+        self.holders = {}
+
+    @property
+    def members(self):
+        return list(self.holders.values())
+
+    @property
+    def mention(self):
+        return f"<@&{self.id}>"
+
+class FakeMember:
+    def __init__(self, member_id, guild, latency):
+        self.id = member_id
+        self.guild = guild
+        self.name = self.display_name = f"user{member_id}"
+        self.mention = f"<@{member_id}>"
+        self.joined_at = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+        self.latency = latency
+
+    def get_role(self, role_id):
+        role = self.guild.get_role(role_id)
+        return role if role and self.id in role.holders else None
+
+    async def add_roles(self, role, reason=None):
+        await asyncio.sleep(self.latency)
+        role.holders[self.id] = self
+
+    async def remove_roles(self, role, reason=None):
+        await asyncio.sleep(self.latency)
+        role.holders.pop(self.id, None)
+
+class FakeChannel:
+    def __init__(self, channel_id, latency):
+        self.id = channel_id
+        self.latency = latency
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.sent.append(content or kwargs.get('embed'))
+
+class FakeGuild:
+    def __init__(self, guild_id, role):
+        self.id = guild_id
+        self.role = role
+        self.members = {}
+        self.chunked = True
+
+    def get_member(self, member_id):
+        return self.members.get(member_id)
+
+    def get_role(self, role_id):
+        return self.role if role_id == self.role.id else None
+
+    async def query_members(self, user_ids, limit, cache):
+        return []
+
+class FakeResponse:
+    def __init__(self):
+        self.done = False
+        self.messages = []
+
+    def is_done(self):
+        return self.done
+
+    async def send_message(self, content=None, **kwargs):
+        self.done = True
+        self.messages.append((content, kwargs))
+
+    async def defer(self, **kwargs):
+        self.done = True
+
+    async def edit_message(self, **kwargs):
+        self.done = True
+        self.messages.append((kwargs.get('content'), kwargs))
+
+class FakeFollowup:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        self.messages.append((content, kwargs))
+
+class FakeAttachment:
+    def __init__(self, filename, data):
+        self.filename = filename
+        self.data = data
+
+    async def read(self):
+        return self.data
+
+class FakeInteraction:
+    def __init__(self, user, guild, channel, custom_id=None, client=None):
+        self.user = user
+        self.client = client
+        self.guild = guild
+        self.channel = channel
+        self.data = {'custom_id': custom_id} if custom_id else {}
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+    async def edit_original_response(self, **kwargs):
+        self.response.messages.append((kwargs.get('content'), kwargs))
+
+class FakeBot:
+    def __init__(self, channels):
+        self.channels = {channel.id: channel for channel in channels}
+        self.cogs = {}
+        self.intents = discord.Intents(guilds=True, members=True)
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def add_view(self, view):
+        pass
+
+    def get_cog(self, name):
+        return self.cogs.get(name)
+
+# -- instrumentation -------------------------------------------------------
+
+class IOTimer:
+    """Adds up wall time spent in a function, split by on-loop vs worker thread."""
+
+    def __init__(self):
+        self.on_loop = 0.0
+        self.threaded = 0.0
+        self.calls = 0
+
+    def wrap(self, owner, name, threaded):
+        func = getattr(owner, name)
+        timer = self
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                timer.calls += 1
+                if threaded:
+                    timer.threaded += elapsed
+                else:
+                    timer.on_loop += elapsed
+        setattr(owner, name, wrapper)
+
+def summarise(latencies, wall):
+    ordered = sorted(latencies)
+    def percentile(q):
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000 if ordered else 0.0
+    return {
+        'count': len(ordered),
+        'seconds': round(wall, 4),
+        'throughput_per_s': round(len(ordered) / wall, 1) if wall else None,
+        'p50_ms': round(percentile(0.5), 3),
+        'p99_ms': round(percentile(0.99), 3),
+        'max_ms': round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+async def run_step(calls, concurrency):
+    """Runs the coroutine factories with at most ``concurrency`` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(factory):
+        async with semaphore:
+            start = time.perf_counter()
+            await factory()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(factory) for factory in calls))
+    return latencies, time.perf_counter() - start
+
+async def drain(rest):
+    """Waits until the scheduler has nothing queued, parked or running."""
+    while any(stats.depth for stats in rest.stats.values()) or rest._active:
+        await asyncio.sleep(0.01)
+
+# -- scenario --------------------------------------------------------------
+
+async def main(args):
+    rng = random.Random(args.seed)
+    latency = args.rest_latency_ms / 1000
+    current = settings.get()
+    role = FakeRole(current.participant_role or 1)
+    guild = FakeGuild(1, role)
+    log_channel = FakeChannel(current.registration_log or 2, latency)
+    channel = FakeChannel(3, latency)
+    bot = FakeBot([log_channel, channel])
+    staff = FakeMember(10 ** 17, guild, latency)
+
+    users = [FakeMember(10 ** 17 + i + 1, guild, latency) for i in range(args.users)]
+    for member in users:
+        guild.members[member.id] = member
+
+    io = IOTimer()
+    io.wrap(Roster, '_append', threaded=False)
+    io.wrap(Roster, '_write_snapshot', threaded=True)
+    io.wrap(grouping, 'save_teams', threaded=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, 'cache'))
+        grouping.TEAMS_FILE = os.path.join(tmp, 'cache', 'teams.json')
+        save_teams = grouping.save_teams
+        grouping.save_teams = lambda teams, seed=None: save_teams(teams, seed, path=grouping.TEAMS_FILE)
+
+        roster = Roster(os.path.join(tmp, 'list.json'), os.path.join(tmp, 'cache', 'roster.journal'))
+        await roster.load()
+        cog = event.Events.__new__(event.Events)
+        cog.bot, cog.roster = bot, roster
+        bot.cogs['Events'] = cog
+        register_view = event.RegisterButton(bot, roster)
+        results, checks = {}, {}
+
+        # register: everyone clicks once, some click a second time
+        clicks = users + rng.sample(users, int(len(users) * args.duplicates))
+        rng.shuffle(clicks)
+        register_interactions = []
+        def register(member):
+            interaction = FakeInteraction(member, guild, channel, '_register')
+            register_interactions.append(interaction)
+            return lambda: register_view.register_callback.callback(interaction)
+        latencies, wall = await run_step([register(member) for member in clicks], args.concurrency)
+        results['register'] = summarise(latencies, wall)
+        registered = roster.to_list()
+        checks['register_no_lost'] = set(registered) == {str(member.id) for member in users}
+        checks['register_no_duplicates'] = len(registered) == len(set(registered)) == len(users)
+        checks['register_roles'] = set(role.holders) == {member.id for member in users}
+        await drain(scheduler.get(bot))  # log posts aren't awaited by the click
+        checks['register_log_messages'] = len(log_channel.sent) == len(users)
+
+        # cancel: a share of the users confirm a cancellation
+        cancelling = rng.sample(users, int(len(users) * args.cancel))
+        def cancel(member):
+            button = event.CancelRegistrationButton(member.id)
+            interaction = FakeInteraction(member, guild, channel, button.custom_id, client=bot)
+            return lambda: button.callback(interaction)
+        latencies, wall = await run_step([cancel(member) for member in cancelling], args.concurrency)
+        results['cancel'] = summarise(latencies, wall)
+        remaining = {str(member.id) for member in users} - {str(member.id) for member in cancelling}
+        checks['cancel_roster'] = set(roster.to_list()) == remaining and len(roster) == len(remaining)
+        checks['cancel_roles'] = {str(member_id) for member_id in role.holders} == remaining
+
+        # /group
+        def group():
+            interaction = FakeInteraction(staff, guild, channel)
+            return lambda: event.Events._group.callback(cog, interaction, teams=args.teams, seed=args.seed)
+        latencies, wall = await run_step([group() for _ in range(args.repeat)], args.concurrency)
+        results['group'] = summarise(latencies, wall)
+        teams = grouping.load_teams(grouping.TEAMS_FILE)['teams']
+        grouped = [user_id for team in teams for user_id in team]
+        checks['group_covers_roster'] = sorted(grouped) == sorted(remaining)
+
+        # /export
+        exports = []
+        def export(format):
+            interaction = FakeInteraction(staff, guild, channel)
+            exports.append((format, interaction))
+            return lambda: event.Events._export.callback(cog, interaction, format=format)
+        formats = ['json', 'jsonl', 'csv']
+        latencies, wall = await run_step([export(formats[i % 3]) for i in range(args.repeat)], args.concurrency)
+        results['export'] = summarise(latencies, wall)
+        format, interaction = next(item for item in exports if item[0] == 'json')
+        exported = json.loads(interaction.followup.messages[-1][1]['file'].fp.read())
+        checks['export_rows'] = sorted(row['user_id'] for row in exported) == sorted(remaining)
+
+        # /import, confirmed: replaces the roster and reconciles the role
+        imported = [str(member.id) for member in rng.sample(users, len(users) // 2)]
+        data = json.dumps(imported).encode()
+        async def import_and_confirm():
+            interaction = FakeInteraction(staff, guild, channel)
+            await event.Events._import.callback(cog, interaction, FakeAttachment('list.json', data))
+            view = interaction.followup.messages[-1][1]['view']
+            await view.confirm_button.callback(interaction)
+        latencies, wall = await run_step([import_and_confirm], args.concurrency)
+        results['import'] = summarise(latencies, wall)
+        checks['import_roster'] = roster.to_list() == imported
+        checks['import_roles'] = {str(member_id) for member_id in role.holders} == set(imported)
+
+        await roster.close()
+        scheduler_stats = scheduler.get(bot).snapshot()
+        scheduler.get(bot).close()
+
+    report = {
+        'config': vars(args),
+        'steps': results,
+        'io': {
+            'on_loop_ms': round(io.on_loop * 1000, 3),
+            'threaded_ms': round(io.threaded * 1000, 3),
+            'calls': io.calls,
+        },
+        'scheduler': scheduler_stats,
+        'correctness': checks,
+        'ok': all(checks.values()),
+    }
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=500, help="callbacks in flight at once")
+    parser.add_argument('--duplicates', type=float, default=0.1, help="share of users who click Register twice")
+    parser.add_argument('--cancel', type=float, default=0.1, help="share of users who cancel")
+    parser.add_argument('--teams', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=10, help="how many times /group and /export run")
+    parser.add_argument('--rest-latency-ms', type=float, default=50.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help="also write the JSON report to this file")
+    args = parser.parse_args()
+    # the bot's own logging (slow-call warnings etc.) goes to stderr so stdout stays JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(main(args))
+    output = json.dumps(report, indent=4)
+    if args.out:
+        with open(args.out, 'w') as file:
+            file.write(output)
+    print(output)
+    sys.exit(0 if report['ok'] else 1)
@@ -0,0 +1,72 @@
+"""Time-to-ready and resident memory for each gateway profile in settings.yaml.
+
+Usage: TOKEN=... python benchmarks/startup.py [profile ...]
+
+Each profile runs in its own process so the numbers don't bleed into each
+other. The child logs in with the real token, waits for on_ready (and, for
+profiles that chunk at startup, for the member chunks), and prints one JSON
+line. The parent collects them into a single JSON report.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # settings.yaml is read relative to the working directory, like the bot
+
+import discord
+from utils import settings
+from utils.gateway import bot_options
+
+TIMEOUT = 300
+
+def rss_kb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return None
+
+def child(name):
+    started = time.perf_counter()
+    client = discord.Client(**bot_options(settings.gateway_profile(name)))
+    result = {}
+
+    @client.event
+    async def on_ready():
+        result['ready_seconds'] = round(time.perf_counter() - started, 3)
+        result['guilds'] = len(client.guilds)
+        result['cached_members'] = sum(len(guild.members) for guild in client.guilds)
+        result['rss_kb'] = rss_kb()
+        await client.close()
+
+    client.run(os.environ['TOKEN'], log_handler=None)
+    print(json.dumps({'profile': name, **result}))
+
+def main(names):
+    names = names or list(settings.get().gateway_profiles)
+    report = []
+    for name in names:
+        try:
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', name],
+                capture_output=True, text=True, timeout=TIMEOUT,
+            )
+        except subprocess.TimeoutExpired:
+            report.append({'profile': name, 'error': f'not ready after {TIMEOUT}s'})
+            continue
+        lines = proc.stdout.strip().splitlines()
+        if proc.returncode or not lines:
+            report.append({'profile': name, 'error': proc.stderr.strip()[-500:]})
+        else:
+            report.append(json.loads(lines[-1]))
+    print(json.dumps(report, indent=4))
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        child(sys.argv[2])
+    else:
+        main(sys.argv[1:])
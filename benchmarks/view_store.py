@@ -0,0 +1,154 @@
+"""How much the client's view store keeps per confirmation prompt.
+
+Usage: python benchmarks/view_store.py [--prompts 10000] [--clicked 0.5] [--out results.json]
+
+Sends ``--prompts`` "cancel your registration?" and "report this bug?" prompts
+into a real ``discord.ui.view.ViewStore`` the way ``InteractionResponse``
+stores a message's view, once with the per-message Views the bot used to send
+and once with the DynamicItem buttons it sends now, and looks up the
+``--clicked`` share of them like a component interaction would. Nothing
+touches the network.
+
+Prints one JSON document with, for both styles, the store's size
+(``_views`` entries, ``_synced_message_views``, dynamic item patterns) and
+traced memory every 1000 prompts (both include the benchmark's own list of
+sent custom_ids, about 250 bytes a prompt), and the lookup time per click.
+"""
+import argparse
+import asyncio
+import gc
+import importlib.util
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # settings.yaml is read relative to the working directory, like the bot
+os.environ.setdefault('TOKEN', 'benchmark')
+
+import discord
+from discord.ui.view import ViewStore
+from utils import errors
+
+spec = importlib.util.spec_from_file_location('commands.event', os.path.join(ROOT, 'commands', 'event.py'))
+event = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(event)
+
+BUTTON = discord.ComponentType.button.value
+USER_ID = 10 ** 17
+
+# -- the views as they were before the DynamicItem buttons -------------------
+
+class LegacyConfirmCancellationView(discord.ui.View):
+    def __init__(self, user_id, roster, bot):
+        super().__init__(timeout=None)
+        self.user_id = user_id
+        self.bot = bot
+        self.roster = roster
+
+    @discord.ui.button(label="Yes, cancel my registration", style=discord.ButtonStyle.danger)
+    async def confirm_button(self, interaction, button):
+        pass
+
+class LegacyReportButton(discord.ui.View):
+    def __init__(self, key):
+        super().__init__(timeout=None)
+        self.key = key
+
+    @discord.ui.button(label='Report Bug', style=discord.ButtonStyle.gray, custom_id="bugbtn")
+    async def report_button(self, interaction, button):
+        pass
+
+def legacy_prompts(i):
+    return [LegacyConfirmCancellationView(str(USER_ID + i), None, None), LegacyReportButton(f"{i:012x}")]
+
+def dynamic_prompts(i):
+    return [
+        discord.ui.View(timeout=None).add_item(event.CancelRegistrationButton(USER_ID + i)),
+        errors.ReportBugButton.view(f"{i:012x}"),
+    ]
+
+# -- measurement -------------------------------------------------------------
+
+def store_view(store, view, message_id):
+    # what InteractionResponse.send_message does with the view it was given
+    if view and not view.is_finished() and view.is_dispatchable():
+        store.add_view(view, message_id)
+
+def custom_ids(view):
+    return [item.custom_id for item in view.walk_children() if item.is_dispatchable()]
+
+async def lookup(store, message_id, custom_id):
+    """Finds the item a click on ``custom_id`` in ``message_id`` goes to, like
+    ``ViewStore.dispatch_view`` plus ``from_custom_id`` for dynamic items."""
+    for pattern, factory in store._dynamic_items.items():
+        match = pattern.fullmatch(custom_id)
+        if match is not None:
+            return await factory.from_custom_id(None, None, match)
+    return store._views.get(message_id, {}).get((BUTTON, custom_id))
+
+def store_size(store):
+    return {
+        'views_entries': sum(len(items) for items in store._views.values()),
+        'synced_message_views': len(store._synced_message_views),
+        'dynamic_item_patterns': len(store._dynamic_items),
+    }
+
+async def run(make_prompts, args, dynamic_items=()):
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    store = ViewStore(None)
+    store.add_dynamic_items(*dynamic_items)
+    samples = []
+    sent = []
+    for i in range(args.prompts):
+        for view in make_prompts(i):
+            message_id = len(sent) + 1
+            store_view(store, view, message_id)
+            sent.append((message_id, custom_ids(view)))
+        if (i + 1) % 1000 == 0 or i + 1 == args.prompts:
+            samples.append({'prompts': i + 1, **store_size(store), 'traced_kib': round((tracemalloc.get_traced_memory()[0] - baseline) / 1024, 1)})
+    del view
+    gc.collect()
+    retained_kib = round((tracemalloc.get_traced_memory()[0] - baseline) / 1024, 1)
+    tracemalloc.stop()
+
+    clicks = sent[::max(1, round(1 / args.clicked))] if args.clicked else []
+    found = 0
+    start = time.perf_counter()
+    for message_id, ids in clicks:
+        for custom_id in ids:
+            found += await lookup(store, message_id, custom_id) is not None
+    elapsed = time.perf_counter() - start
+    total = sum(len(ids) for _, ids in clicks)
+    return {
+        'samples': samples,
+        'retained_kib': retained_kib,
+        'clicks': total,
+        'clicks_resolved': found,
+        'lookup_us': round(elapsed / total * 1e6, 3) if total else None,
+    }
+
+async def main(args):
+    return {
+        'config': vars(args),
+        'legacy_views': await run(legacy_prompts, args),
+        'dynamic_items': await run(dynamic_prompts, args, (event.CancelRegistrationButton, errors.ReportBugButton)),
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--prompts', type=int, default=10000, help="prompts of each kind sent")
+    parser.add_argument('--clicked', type=float, default=0.5, help="share of prompts whose button is clicked")
+    parser.add_argument('--out', help="also write the JSON report to this file")
+    args = parser.parse_args()
+    report = asyncio.run(main(args))
+    output = json.dumps(report, indent=4)
+    if args.out:
+        with open(args.out, 'w') as file:
+            file.write(output)
+    print(output)
@@ -0,0 +1,92 @@
+"""Runs the bot as ``cluster.processes`` processes, each with its share of the shards.
+
+Usage: python cluster.py
+
+Every process is a normal ``main.py`` told its cluster ID through environment
+variables. The launcher hosts the IPC socket they use for cross-cluster
+commands and stats, serves each process' health endpoints on PORT + cluster ID,
+and restarts a process that exits, with backoff.
+"""
+import asyncio
+import os
+import signal
+import sys
+import time
+import discord
+import config
+from utils import settings
+from utils.cluster import Hub
+
+RESTART_DELAY = 5
+MAX_RESTART_DELAY = 300
+STABLE_AFTER = 60  # a process that ran this long resets the backoff
+
+async def recommended_shards():
+    http = discord.http.HTTPClient()
+    try:
+        await http.static_login(config.TOKEN)
+        shards, _, _ = await http.get_bot_gateway()
+        return shards
+    finally:
+        await http.close()
+
+async def supervise(cluster_id, env, processes, stopping):
+    delay = RESTART_DELAY
+    while not stopping.is_set():
+        started = time.monotonic()
+        process = processes[cluster_id] = await asyncio.create_subprocess_exec(
+            sys.executable, 'main.py', env=env,
+            start_new_session=True,  # Ctrl-C reaches the launcher only; it forwards SIGINT itself
+        )
+        print(f"[+] cluster {cluster_id} — pid {process.pid}")
+        code = await process.wait()
+        if stopping.is_set():
+            break
+        if time.monotonic() - started > STABLE_AFTER:
+            delay = RESTART_DELAY
+        print(f"[-] cluster {cluster_id} exited with {code}, restarting in {delay}s")
+        try:
+            await asyncio.wait_for(stopping.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+        delay = min(delay * 2, MAX_RESTART_DELAY)
+
+async def main():
+    cluster = settings.get().cluster
+    shard_count = cluster.shards if isinstance(cluster.shards, int) else await recommended_shards()
+    shard_count = max(shard_count, cluster.processes)
+    print(f"[~] {shard_count} shard(s) over {cluster.processes} process(es)")
+
+    hub = Hub(cluster.socket)
+    await hub.start()
+
+    stopping = asyncio.Event()
+    processes = {}
+
+    def stop():
+        stopping.set()
+        for process in processes.values():
+            if process.returncode is None:
+                process.send_signal(signal.SIGINT)  # discord.py closes the connection cleanly on SIGINT
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop)
+
+    base_port = int(os.environ.get('PORT', 8080))
+    tasks = []
+    for cluster_id in range(cluster.processes):
+        env = dict(
+            os.environ,
+            CLUSTER_ID=str(cluster_id),
+            CLUSTER_COUNT=str(cluster.processes),
+            SHARD_COUNT=str(shard_count),
+            CLUSTER_SOCKET=os.path.abspath(cluster.socket),
+            PORT=str(base_port + cluster_id),
+        )
+        tasks.append(asyncio.create_task(supervise(cluster_id, env, processes, stopping)))
+    await asyncio.gather(*tasks)
+    await hub.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
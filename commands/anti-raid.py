@@ -1,14 +1,122 @@
+import asyncio
 import discord
 from discord.ext import commands
-from utils.staff import is_staff
+import time
+from utils.staff import requires_level, member_level
+from utils.text import normalise
+from utils.raid import RaidDetector
+from utils.message_index import MessageIndex
+from utils import scheduler, settings
 import config 
 
+ZWSP_BACKTICK = "`\u200b"  # a backtick that can't close a code block
+
 class AntiRaid(commands.Cog):
+    required_intents = discord.Intents(guilds=True, members=True, guild_messages=True, message_content=True, guild_reactions=True)
+
     def __init__(self, bot):
         self.bot = bot
+        self.detector = RaidDetector(settings.get().raid_detection)
+        self.index = MessageIndex()
+        self.index_config = None
+        # (guild_id, raid key) -> [cooldown expiry, user IDs already actioned]
+        self.flagged = {}
+
+    def detection_config(self):
+        detection = settings.get().raid_detection
+        if self.detector.config is not detection:
+            self.detector.config = detection
+        return detection
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if message.guild is None or message.author.bot or not message.content:
+            return
+        content = normalise(message.content)
+        index_config = settings.get().message_index
+        if index_config is not self.index_config:
+            self.index.configure(index_config.default_capacity, index_config.channels, index_config.max_entries)
+            self.index_config = index_config
+        self.index.add(message.guild.id, message.channel.id, message.id, message.author.id, message.created_at.timestamp(), hash(content))
+
+        detection = self.detection_config()
+        if not detection.enabled or member_level(message.author) > 0:
+            return
+        hit = self.detector.message(message.guild.id, message.author.id, content, time.monotonic())
+        if hit:
+            fingerprint, user_ids = hit
+            await self.raid_detected(message.guild, ('message', fingerprint), user_ids, detection, channel=message.channel, sample=message.content)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        if member.bot:
+            return
+        detection = self.detection_config()
+        if not detection.enabled:
+            return
+        user_ids = self.detector.join(member.guild.id, member.id, time.monotonic())
+        if user_ids:
+            await self.raid_detected(member.guild, ('joins',), user_ids, detection)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        self.index.delete(payload.channel_id, payload.message_id)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        for message_id in payload.message_ids:
+            self.index.delete(payload.channel_id, message_id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.index.forget_channel(channel.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.detector.forget(guild.id)
+        for channel_id in self.index.channels(guild.id):
+            self.index.forget_channel(channel_id)
+
+    async def raid_detected(self, guild, key, user_ids, detection, channel=None, sample=None):
+        now = time.monotonic()
+        for flag in [flag for flag, (expiry, _) in self.flagged.items() if expiry < now]:
+            del self.flagged[flag]
+
+        entry = self.flagged.get((guild.id, key))
+        first = entry is None
+        if first:
+            entry = self.flagged[(guild.id, key)] = [now + detection.cooldown_seconds, set()]
+        fresh = [user_id for user_id in user_ids if user_id not in entry[1]]
+        entry[1].update(fresh)
+
+        rest = scheduler.get(self.bot)
+        pending = []
+        if detection.action == 'quarantine' and detection.quarantine_role:
+            role = guild.get_role(detection.quarantine_role)
+            members = [member for member in map(guild.get_member, fresh) if member is not None]
+            if role is not None:
+                pending += [rest.set_role(member, role, True, reason="Raid detection", lane=scheduler.MODERATION) for member in members]
+        if first and detection.action == 'slowmode' and channel is not None:
+            pending.append(rest.submit(scheduler.MODERATION, ('channel', channel.id), lambda: channel.edit(slowmode_delay=detection.slowmode_seconds, reason="Raid detection")))
+
+        alert_channel = self.bot.get_channel(settings.get().raid_alerts_channel)
+        if first and alert_channel is not None:
+            if key[0] == 'joins':
+                description = f"**{len(user_ids)}** members joined within {detection.join_window_seconds:g}s."
+            else:
+                description = f"**{len(user_ids)}** accounts posted the same message in {channel.mention} within {detection.window_seconds:g}s.\n```{sample[:300].replace('`', ZWSP_BACKTICK)}```"
+            embed = discord.Embed(title="Possible raid detected", description=description, color=config.PRIMARY_COLOR)
+            embed.add_field(name="Accounts", value=" ".join(f"<@{user_id}>" for user_id in user_ids)[:1024], inline=False)
+            embed.set_footer(text=f"{guild.name} · action: {detection.action}")
+            pending.append(rest.send(alert_channel, embed=embed, lane=scheduler.MODERATION))
+
+        results = await asyncio.gather(*pending, return_exceptions=True)
+        failed = [result for result in results if isinstance(result, Exception)]
+        if failed:
+            print(f"[-] raid response in {guild.id}: {len(failed)} of {len(results)} actions failed ({failed[0]!r})")
 
     @commands.command(name="massban", aliases=['mb'], usage="<message>", description="Mass bans all the users who sent a specific message. Use it during raids.")
-    @commands.check(is_staff)
+    @requires_level(50)
     @commands.has_permissions(manage_guild=True)
     async def mass_ban(self, ctx, *, target_message: str):
         """Bans users who sent a certain message."""
@@ -16,37 +124,59 @@ class AntiRaid(commands.Cog):
             await ctx.send("This command can only be used in a server.")
             return
 
-        m = await ctx.send("🔎 Scanning messages... Please wait.")
-        matching_users = set() 
-        async for message in ctx.channel.history(limit=100): 
-            if message.content == target_message:
-                matching_users.add((message.author.id, str(message.author)))
+        target = normalise(target_message)
+        if not target:
+            await ctx.send(f"{config.ERROR} That message is empty once invite links and whitespace are stripped.")
+            return
+
+        scan_start = time.monotonic()
+        indexed = self.index.channels(ctx.guild.id)
+        authors = self.index.authors(hash(target), indexed)
+        authors.pop(ctx.author.id, None)
+        if authors:
+            scanned, channel_count, source = self.index.message_count(indexed), len(indexed), "index"
+            matching_users = {user_id: str(ctx.guild.get_member(user_id) or user_id) for user_id in authors}
+        else:
+            m = await ctx.send("🔎 Scanning messages... Please wait.")
+            current = settings.get()
+            channels = [ctx.channel] + [
+                channel for channel in map(ctx.guild.get_channel, current.massban_channels)
+                if channel is not None and channel != ctx.channel
+            ]
+            scanned, matching_users = await self.scan(channels, target, current.massban_scan_depth)
+            matching_users.pop(ctx.author.id, None)
+            channel_count, source = len(channels), "history"
+            await m.delete()
+        scan_time = time.monotonic() - scan_start
 
         if not matching_users:
-            await ctx.send(f"{config.ERROR} No users found who sent that message.")
+            await ctx.send(f"{config.ERROR} No users found who sent that message. (scanned **{scanned}** messages in {channel_count} channel(s), {scan_time:.2f}s)")
             return
 
-        await m.delete()
-
+        listing = "\n".join([f"{username}\n-# ➜ {user_id}" for user_id, username in matching_users.items()])
+        if len(listing) > 3800:
+            listing = listing[:3800].rsplit("\n", 1)[0] + "\n..."
         embed = discord.Embed(
             title="Mass Ban Confirmation",
-            description="\n".join([f"{username}\n-# ➜ {user_id}" for user_id, username in matching_users]),
+            description=listing,
             color=config.SECONDARY_COLOR
         )
+        embed.set_footer(text=f"{scanned} messages scanned in {channel_count} channel(s) from {source} · {len(matching_users)} users matched · {scan_time:.2f}s")
 
         confirmation_message = await ctx.send(embed=embed)
         await confirmation_message.add_reaction(config.SUCCESS)
         await confirmation_message.add_reaction(config.ERROR)
 
-        def check(reaction, user):
+        # raw event: works without the message cache (see gateway profiles in settings.yaml)
+        def check(payload):
             return (
-                user == ctx.author
-                and str(reaction.emoji) in [config.SUCCESS, config.ERROR]
-                and reaction.message.id == confirmation_message.id
+                payload.user_id == ctx.author.id
+                and str(payload.emoji) in [config.SUCCESS, config.ERROR]
+                and payload.message_id == confirmation_message.id
             )
 
         try:
-            reaction, user = await self.bot.wait_for("reaction_add", timeout=60.0, check=check)
+            reaction = await self.bot.wait_for("raw_reaction_add", timeout=60.0, check=check)
             await confirmation_message.clear_reactions()
         except asyncio.TimeoutError:
             await ctx.send(f"{config.ERROR} Confirmation timed out. No action taken.")
@@ -56,17 +186,34 @@ class AntiRaid(commands.Cog):
             await ctx.send(f"{config.ERROR} Mass ban canceled.")
             return
 
-        banned_count = 0
-        for user_id, _ in matching_users:
+        ban_start = time.monotonic()
+        banned, failed = await scheduler.get(self.bot).ban_users(ctx.guild, list(matching_users), reason="Raid")
+        ban_time = time.monotonic() - ban_start
+
+        if failed:
+            await ctx.send(f"{config.ERROR} Failed to ban **{len(failed)}** users: " + ", ".join(f"`{user_id}`" for user_id in failed[:50]))
+        await ctx.send(
+            f"{config.SUCCESS} Successfully banned **{banned}** users.\n"
+            f"-# scanned {scanned} messages · matched {len(matching_users)} users · scan {scan_time:.2f}s · ban {ban_time:.2f}s"
+        )
+
+    async def scan(self, channels, target, depth):
+        """Scans ``channels`` concurrently. Returns the message count and {user_id: username} of matching authors."""
+        matching_users = {}
+
+        async def scan_channel(channel):
+            count = 0
             try:
-                await ctx.guild.ban(discord.Object(id=user_id), reason="Raid")
-                banned_count += 1
-            except discord.Forbidden:
-                await ctx.send(f"{config.ERROR} Failed to ban user with ID `{user_id}` (missing permissions).")
-            except discord.HTTPException:
-                await ctx.send(f"{config.ERROR} Failed to ban user with ID `{user_id}` (HTTP error).")
-
-        await ctx.send(f"{config.SUCCESS} Successfully banned **{banned_count}** users.")
+                async for message in channel.history(limit=depth):
+                    count += 1
+                    if normalise(message.content) == target:
+                        matching_users[message.author.id] = str(message.author)
+            except (discord.Forbidden, discord.HTTPException):
+                pass
+            return count
+
+        counts = await asyncio.gather(*(scan_channel(channel) for channel in channels))
+        return sum(counts), matching_users
 
 async def setup(bot):
     await bot.add_cog(AntiRaid(bot))
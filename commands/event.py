@@ -1,73 +1,215 @@
+import asyncio
+import csv
 import discord
+import gzip
+import io
 import json
-from discord.ext import commands
+import random
+import time
+from discord.ext import commands, tasks
 from discord import app_commands as slash
 from utils.staff import is_event_team
+from utils.roster import Roster, RegistrationClosed
+from utils.lifecycle import Lifecycle, parse_duration, parse_time
+from utils.members import resolve_members
+from utils import scheduler, metrics, grouping, reconcile, errors
+from utils import settings
 import config
-import yaml
+
+EXPORT_FIELDS = ['user_id', 'display_name', 'joined_at', 'in_server', 'has_role']
+REMINDER_GRACE = 600  # reminders that came due more than this long ago (bot offline) are dropped
 
 class Events(commands.Cog):
+    # members: role.members and on-demand chunking for /export and /reconcile
+    required_intents = discord.Intents(guilds=True, members=True)
+
     def __init__(self, bot):
         self.bot = bot
-        self.list_file = 'list.json'
-        self.register_btn = RegisterButton(self.bot)
-        with open('settings.yaml', 'r') as f:
-            self.settings = yaml.safe_load(f)
+        self.roster = Roster()
+        self.register_btn = RegisterButton(self.bot, self.roster)
+        self.lifecycle = Lifecycle(self.run_step)
 
     async def cog_load(self):
+        self.warm_up = None
+        # the roster is global, so in cluster mode only the home process keeps it
+        if not self.bot.cluster.is_home:
+            return
+        # don't hold up startup; commands wait for the roster in interaction_check
+        self.warm_up = asyncio.create_task(self.load_roster())
+
+    async def load_roster(self):
+        await self.roster.load()
+        await self.lifecycle.load()
+        self.apply_event_state()
         self.bot.add_view(self.register_btn)
+        self.bot.add_dynamic_items(CancelRegistrationButton)
+        self.snapshot_roster.start()
+        # deadlines that passed while the bot was offline fire right away
+        self.lifecycle.start()
 
     async def cog_unload(self):
-        await self.register_btn.wait()
+        if self.warm_up:
+            self.warm_up.cancel()
+        self.snapshot_roster.cancel()
+        self.lifecycle.stop()
+        self.register_btn.stop()
+        self.bot.remove_dynamic_items(CancelRegistrationButton)
+        if self.roster.ready.is_set():
+            await self.roster.close()
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        if self.warm_up is None:
+            await interaction.response.send_message("Event commands are only available in the main server.", ephemeral=True)
+            return False
+        await self.roster.ready.wait()
+        return True
+
+    @tasks.loop(seconds=30)
+    async def snapshot_roster(self):
+        await self.roster.snapshot()
 
     @slash.command(name="group", description="Divide participants into groups.")
     @slash.check(is_event_team)
-    @slash.describe(teams="Number of groups to divide the participants into. Default is 2.")
-    async def _group(self, interaction: discord.Interaction, teams: int = None):
+    @slash.describe(
+        teams="Number of groups to divide the participants into. Default is 2.",
+        team_size="Make teams of this size instead of a fixed number of teams.",
+        seed="Shuffle seed, to reproduce the same teams.",
+        ratings="JSON file mapping user IDs to ratings, used to balance the teams.",
+        together="Users to keep in the same team, e.g. `@a @b, @c @d`.",
+        apart="Users to put in different teams, e.g. `@a @b, @c @d`.")
+    async def _group(self, interaction: discord.Interaction, teams: int = None, team_size: int = None,
+                     seed: int = None, ratings: discord.Attachment = None, together: str = None, apart: str = None):
         try:
-            with open(self.list_file, 'r') as file:
-                participants = json.load(file)
+            participants = self.roster.to_list()
             
-            if not isinstance(participants, list) or not participants:
+            if not participants:
                 raise ValueError("The participants list is empty.")
             
             if teams is None:
             	teams = 2
             	
-            if not teams <= 2:
-                await interaction.response.send_message(
-                    "The number of teams must be greater than two.", ephemeral=True
-                )
-                return
-            
-            group_size = len(participants) // teams
-            remainder = len(participants) % teams
-
-            groups = []
-            start = 0
-            for i in range(teams):
-                size = group_size + (1 if remainder > 0 else 0)
-                groups.append(participants[start:start + size])
-                start += size
-                remainder -= 1
-
-            formatted_groups = "\n\n".join(
-            [f"**Team {i+1}:**\n" + "\n".join([f"<@{user_id}>" for user_id in group]) for i, group in enumerate(groups)]
-            )
+            if team_size is None and teams < 2:
+                raise ValueError("The number of teams must be at least two.")
+            if team_size is not None and team_size < 1:
+                raise ValueError("The team size must be at least one.")
 
-            embed = discord.Embed(description=formatted_groups)
+            rating_map = None
+            if ratings is not None:
+                try:
+                    rating_map = {str(user_id): float(rating) for user_id, rating in json.loads(await ratings.read()).items()}
+                except (ValueError, AttributeError, TypeError):
+                    raise ValueError("The ratings file must be a JSON object mapping user IDs to numbers.")
 
-            await interaction.response.send_message(embed=embed)
-            
-        except FileNotFoundError:
-            await interaction.response.send_message(
-                "The participants list does not exist.", ephemeral=True
+            if seed is None:
+                seed = random.randrange(2 ** 31)
+            groups = grouping.form_teams(
+                participants, teams=teams, team_size=team_size, seed=seed, ratings=rating_map,
+                together=grouping.parse_pairs(together), apart=grouping.parse_pairs(apart),
             )
+            await asyncio.to_thread(grouping.save_teams, groups, seed)
+
+            await interaction.response.send_message(**self.teams_message(groups, seed))
+            
         except ValueError as e:
             await interaction.response.send_message(
                 str(e), ephemeral=True
             )
 
+    @slash.command(name="teams", description="Re-posts the last teams made with /group.")
+    @slash.check(is_event_team)
+    async def _teams(self, interaction: discord.Interaction):
+        saved = await asyncio.to_thread(grouping.load_teams)
+        if not saved:
+            await interaction.response.send_message(
+                "No teams have been made yet.", ephemeral=True
+            )
+            return
+        await interaction.response.send_message(**self.teams_message(saved['teams'], saved.get('seed')))
+
+    def teams_message(self, groups, seed):
+        formatted_groups = "\n\n".join(
+        [f"**Team {i+1}:**\n" + "\n".join([f"<@{user_id}>" for user_id in group]) for i, group in enumerate(groups)]
+        )
+        data = json.dumps(groups, indent=4).encode()
+        file = discord.File(io.BytesIO(data), filename="teams.json")
+        if len(formatted_groups) > 4000:
+            summary = "\n".join(f"**Team {i+1}:** {len(group)} members" for i, group in enumerate(groups))
+            embed = discord.Embed(description=summary[:4000] + "\n** **\nThe full teams are attached.")
+        else:
+            embed = discord.Embed(description=formatted_groups)
+        embed.set_footer(text=f"seed {seed}")
+        return {'embed': embed, 'file': file}
+
+    def registration_embed(self, title, description):
+        return discord.Embed(description=f"## {config.EVENT}  Event Registration\n** **\n### __{title}__\n** **\n{description}\n** **", color=config.TRANSPARENT)
+
+    def apply_event_state(self):
+        # the Register button checks these, so closing never has to edit the posted messages
+        event = self.lifecycle.event
+        self.roster.closed = event is not None and event['state'] != 'open'
+        self.roster.capacity = event.get('capacity') if event else None
+
+    async def run_step(self, kind, late):
+        event = self.lifecycle.event
+        if event is None:
+            return
+        if kind == 'open':
+            await self.open_registration()
+        elif kind == 'remind':
+            if event['state'] == 'open' and late < REMINDER_GRACE:
+                await self.send_reminder()
+        elif kind == 'close':
+            await self.close_registration("the deadline has passed")
+
+    async def open_registration(self):
+        event = self.lifecycle.event
+        event['state'] = 'open'
+        self.apply_event_state()
+        await self.lifecycle.save()
+        channel = self.bot.get_channel(event['channel_id'])
+        if channel:
+            await channel.send(embed=self.registration_embed(event['title'], event['description']), view=self.register_btn)
+
+    async def send_reminder(self):
+        event = self.lifecycle.event
+        channel = self.bot.get_channel(event['channel_id'])
+        if channel is None:
+            return
+        role_id = settings.get().participant_role
+        mention = f"<@&{role_id}> " if role_id else ""
+        closes = f" closes <t:{int(event['closes_at'])}:R>" if event.get('closes_at') else " is open"
+        await scheduler.get(self.bot).send(
+            channel,
+            f"{mention}Registration for **{event['title']}**{closes}. **{len(self.roster)}** registered so far.",
+            allowed_mentions=discord.AllowedMentions(roles=True),
+        )
+
+    async def close_registration(self, reason):
+        """Closes registration and runs the automatic /group, if one was scheduled.
+        Returns False if it was already closed."""
+        event = self.lifecycle.event
+        if event is None or event['state'] == 'closed':
+            return False
+        event['state'] = 'closed'
+        self.apply_event_state()
+        await self.lifecycle.clear_timers()
+
+        channel = self.bot.get_channel(event['channel_id'])
+        if channel:
+            await channel.send(f"Registration for **{event['title']}** is closed: {reason}. **{len(self.roster)}** participants.")
+        teams = event.get('teams')
+        if teams and len(self.roster) >= teams:
+            seed = random.randrange(2 ** 31)
+            groups = grouping.form_teams(self.roster.to_list(), teams=teams, seed=seed)
+            await asyncio.to_thread(grouping.save_teams, groups, seed)
+            if channel:
+                await channel.send(**self.teams_message(groups, seed))
+        return True
+
+    @commands.Cog.listener()
+    async def on_registration_full(self):
+        await self.close_registration("the event is full")
+
     @slash.command(name="register-event",
                    description="Post the Event Registration embed")
     @slash.guild_only()
@@ -81,32 +223,154 @@ class Events(commands.Cog):
                               channel: discord.TextChannel = None):
         if channel is None:
             channel = interaction.channel
-        embed = discord.Embed(description=f"## {config.EVENT}  Event Registration\n** **\n### __{title}__\n** **\n{description}\n** **", color=config.TRANSPARENT)
+        # an event opened by hand: no deadline, replaces any pending schedule
+        await self.lifecycle.schedule({
+            'title': title, 'description': description, 'channel_id': channel.id,
+            'opens_at': time.time(), 'closes_at': None, 'capacity': None, 'teams': None, 'state': 'open',
+        }, [])
+        self.apply_event_state()
 
-        await channel.send(embed=embed, view=self.register_btn)
+        await channel.send(embed=self.registration_embed(title, description), view=self.register_btn)
         await interaction.response.send_message(
             "Successfully posted the Event Registration embed!")
-            
-    @slash.command(name="export", description="Exports the participant list as a JSON file.")
+
+    @slash.command(name="schedule-event", description="Schedules an event: opening, deadline, capacity, reminders and teams.")
+    @slash.guild_only()
     @slash.check(is_event_team)
-    async def _export(self, interaction: discord.Interaction):
+    @slash.describe(
+        closes="When registration closes, e.g. `in 2d`, `2026-05-01 18:00` (UTC) or a Discord timestamp.",
+        opens="When registration opens and the embed is posted. Default is now.",
+        channel="Channel to post the Event Registration embed in.",
+        capacity="Close registration once this many people have registered.",
+        reminders="Reminders before the deadline, e.g. `1d, 1h, 10m`.",
+        teams="Make this many teams when registration closes.")
+    async def _schedule_event(self, interaction: discord.Interaction, title: str, description: str, closes: str = None,
+                              opens: str = None, channel: discord.TextChannel = None, capacity: int = None,
+                              reminders: str = None, teams: int = None):
         try:
-            with open(self.list_file, 'r') as file:
-                user_list = json.load(file)
-                if not isinstance(user_list, list) or not user_list:
-                    raise ValueError("The participant list is empty.")
-            await interaction.response.send_message(
-                file=discord.File(self.list_file, filename="list.json")
-            )
-        except FileNotFoundError:
-            await interaction.response.send_message(
-                "The participant list does not exist.",
-                ephemeral=True
-            )
+            now = time.time()
+            opens_at = parse_time(opens, now) if opens else now
+            closes_at = parse_time(closes, now) if closes else None
+            if closes_at is not None and closes_at <= max(opens_at, now):
+                raise ValueError("The deadline must be after the opening time.")
+            if capacity is not None and capacity < 1:
+                raise ValueError("The capacity must be at least one.")
+            if teams is not None and teams < 2:
+                raise ValueError("The number of teams must be at least two.")
+            if reminders and closes_at is None:
+                raise ValueError("Reminders need a deadline.")
+            offsets = [parse_duration(offset) for offset in reminders.split(',')] if reminders else []
         except ValueError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+
+        channel = channel or interaction.channel
+        opens_later = opens_at > now + 1
+        timers = [(closes_at - offset, 'remind') for offset in offsets if closes_at - offset > max(opens_at, now)]
+        if opens_later:
+            timers.append((opens_at, 'open'))
+        if closes_at is not None:
+            timers.append((closes_at, 'close'))
+        await self.lifecycle.schedule({
+            'title': title, 'description': description, 'channel_id': channel.id,
+            'opens_at': opens_at, 'closes_at': closes_at, 'capacity': capacity, 'teams': teams,
+            'state': 'scheduled' if opens_later else 'open',
+        }, timers)
+        self.apply_event_state()
+
+        await interaction.response.send_message(embed=self.schedule_embed(), ephemeral=True)
+        if not opens_later:
+            await self.open_registration()
+
+    @slash.command(name="event-schedule", description="Shows the scheduled event and its upcoming steps.")
+    @slash.check(is_event_team)
+    async def _event_schedule(self, interaction: discord.Interaction):
+        if self.lifecycle.event is None:
+            await interaction.response.send_message("No event has been scheduled.", ephemeral=True)
+            return
+        await interaction.response.send_message(embed=self.schedule_embed(), ephemeral=True)
+
+    def schedule_embed(self):
+        event = self.lifecycle.event
+        lines = [
+            f"**State:** {event['state']}",
+            f"**Channel:** <#{event['channel_id']}>",
+            f"**Registered:** {len(self.roster)}" + (f" / {event['capacity']}" if event.get('capacity') else ""),
+        ]
+        if event.get('closes_at'):
+            lines.append(f"**Deadline:** <t:{int(event['closes_at'])}:f>")
+        if event.get('teams'):
+            lines.append(f"**Teams at close:** {event['teams']}")
+        steps = [f"<t:{int(due)}:R> {kind}" for due, kind in self.lifecycle.timers]
+        if steps:
+            lines.append("** **\n**Upcoming:**\n" + "\n".join(steps))
+        return discord.Embed(title=event['title'], description="\n".join(lines), color=config.SECONDARY_COLOR)
+
+    @slash.command(name="close-registration", description="Closes registration now (and makes the scheduled teams).")
+    @slash.check(is_event_team)
+    async def _close_registration(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        if await self.close_registration(f"closed by {interaction.user.display_name}"):
+            await interaction.followup.send("Registration has been closed.", ephemeral=True)
+        else:
+            await interaction.followup.send("Registration is not open.", ephemeral=True)
+            
+    @slash.command(name="export", description="Exports the participant list as a CSV, JSON or JSON Lines file.")
+    @slash.check(is_event_team)
+    @slash.guild_only()
+    @slash.describe(format="File format. Default is JSON.", compress="Gzip the file.")
+    @slash.choices(format=[
+        slash.Choice(name="JSON", value="json"),
+        slash.Choice(name="JSON Lines", value="jsonl"),
+        slash.Choice(name="CSV", value="csv"),
+    ])
+    async def _export(self, interaction: discord.Interaction, format: str = "json", compress: bool = False):
+        user_list = self.roster.to_list()
+        if not user_list:
             await interaction.response.send_message(
-                str(e), ephemeral=True
+                "The participant list is empty.", ephemeral=True
             )
+            return
+
+        await interaction.response.defer(thinking=True)
+        guild = interaction.guild
+        members = await resolve_members(guild, [int(user_id) for user_id in user_list], self.bot.intents.members)
+        role_id = settings.get().participant_role
+
+        def rows():
+            for user_id in user_list:
+                member = members.get(int(user_id))
+                yield {
+                    'user_id': user_id,
+                    'display_name': member.display_name if member else None,
+                    'joined_at': member.joined_at.isoformat() if member and member.joined_at else None,
+                    'in_server': member is not None,
+                    'has_role': member is not None and member.get_role(role_id) is not None,
+                }
+
+        buffer = io.BytesIO()
+        raw = gzip.GzipFile(fileobj=buffer, mode='wb') if compress else buffer
+        out = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+        if format == "csv":
+            writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows())
+        elif format == "jsonl":
+            for row in rows():
+                out.write(json.dumps(row) + "\n")
+        else:
+            out.write("[\n")
+            for i, row in enumerate(rows()):
+                out.write((",\n" if i else "") + "    " + json.dumps(row))
+            out.write("\n]\n")
+        out.flush()
+        out.detach()
+        if compress:
+            raw.close()
+
+        buffer.seek(0)
+        filename = f"list.{format}" + (".gz" if compress else "")
+        await interaction.followup.send(file=discord.File(buffer, filename=filename))
 
     @slash.command(name="import", description="Imports a participant list from a JSON file.")
     @slash.check(is_event_team)
@@ -122,58 +386,79 @@ class Events(commands.Cog):
             new_list = json.loads(data)
             if not isinstance(new_list, list):
                 raise ValueError("Invalid JSON format.")
+            # /export writes objects; plain ID lists are still accepted
+            new_list = [str(entry['user_id']) if isinstance(entry, dict) else str(entry) for entry in new_list]
         except Exception:
             await interaction.response.send_message(
                 "Unable to parse the JSON file.", ephemeral=True
             )
             return
 
-        confirmation_view = ConfirmOverwriteView(self.list_file, new_list, "Participants list has been imported successfully.")
-        await interaction.response.send_message(
-            "This will erase the current participants list. Do you wish to continue?",
-            view=confirmation_view,
-            ephemeral=True,
-        )
+        await self.confirm_overwrite(interaction, new_list, "This will erase the current participants list.", "Participants list has been imported successfully.")
 
     @slash.command(name="clear", description="Clears the participant list.")
     @slash.check(is_event_team)
     async def _clear(self, interaction: discord.Interaction):
-        try:
-            with open(self.list_file, 'r') as file:
-                user_list = json.load(file)
-                if not isinstance(user_list, list) or not user_list:
-                    raise ValueError("The participant list is already empty.")
-        except FileNotFoundError:
-            await interaction.response.send_message(
-                "The participant list does not exist.", ephemeral=True
-            )
-            return
-        except ValueError as e:
+        if not len(self.roster):
             await interaction.response.send_message(
-                str(e), ephemeral=True
+                "The participant list is already empty.", ephemeral=True
             )
             return
 
-        confirmation_view = ConfirmOverwriteView(self.list_file, [], "Participants list has been cleared.")
-        await interaction.response.send_message(
-            "This will clear the current participants list. Do you wish to continue?",
+        await self.confirm_overwrite(interaction, [], "This will clear the current participants list.", "Participants list has been cleared.")
+
+    async def confirm_overwrite(self, interaction, new_list, warning, success_message):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        role = interaction.guild.get_role(settings.get().participant_role) if interaction.guild else None
+        plan = await reconcile.plan(interaction.guild, role, new_list, self.bot.intents.members) if role else ([], [])
+        confirmation_view = ConfirmOverwriteView(self.bot, self.roster, new_list, success_message, role)
+        await interaction.followup.send(
+            f"{warning} The participant role will be given to **{len(plan[0])}** and removed from **{len(plan[1])}** members. Do you wish to continue?",
             view=confirmation_view,
             ephemeral=True,
         )
 
+    @slash.command(name="reconcile", description="Syncs the participant role with the participant list.")
+    @slash.check(is_event_team)
+    @slash.guild_only()
+    @slash.describe(dry_run="Only show how many roles would change.")
+    async def _reconcile(self, interaction: discord.Interaction, dry_run: bool = False):
+        role = interaction.guild.get_role(settings.get().participant_role)
+        if role is None:
+            await interaction.response.send_message(
+                "The participant role does not exist.", ephemeral=True
+            )
+            return
+
+        await interaction.response.defer(thinking=True)
+        to_add, to_remove = await reconcile.plan(interaction.guild, role, self.roster.to_list(), self.bot.intents.members)
+        summary = f"{role.mention}: **+{len(to_add)}** / **-{len(to_remove)}**"
+        if dry_run or not (to_add or to_remove):
+            await interaction.followup.send(f"{summary} (dry run)" if dry_run else f"{summary} — already in sync.", allowed_mentions=discord.AllowedMentions.none())
+            return
+
+        message = await interaction.followup.send(f"{summary}\nReconciling roles... 0/{len(to_add) + len(to_remove)}", allowed_mentions=discord.AllowedMentions.none(), wait=True)
+
+        async def progress(done, total, failed):
+            await message.edit(content=f"{summary}\nReconciling roles... {done}/{total}" + (f" ({failed} failed)" if failed else ""))
+
+        failed = await reconcile.apply(scheduler.get(self.bot), role, to_add, to_remove, progress)
+        await message.edit(content=f"{summary}\n{config.SUCCESS} Done" + (f", {failed} failed." if failed else "."))
 
-class ConfirmOverwriteView(discord.ui.View):
-    def __init__(self, list_file, new_list, success_message):
+
+class ConfirmOverwriteView(errors.ReportingView):
+    def __init__(self, bot, roster, new_list, success_message, role):
         super().__init__(timeout=60)
-        self.list_file = list_file
+        self.bot = bot
+        self.roster = roster
         self.new_list = new_list
         self.success_message = success_message
+        self.role = role
 
     @discord.ui.button(label="Yes, do it", style=discord.ButtonStyle.danger)
     async def confirm_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         try:
-            with open(self.list_file, 'w') as file:
-                json.dump(self.new_list, file, indent=4)
+            await self.roster.replace(self.new_list)
         except Exception as e:
             await interaction.response.edit_message(
                 content=f"Failed to update the list. {str(e)}",
@@ -188,83 +473,126 @@ class ConfirmOverwriteView(discord.ui.View):
         await interaction.channel.send(f"{interaction.user.mention} has overwritten the participant list."
         )
 
-class RegisterButton(discord.ui.View):
-    def __init__(self, bot):
+        if self.role is None:
+            return
+        # re-plan: the preview shown in the prompt may be up to a minute old
+        to_add, to_remove = await reconcile.plan(interaction.guild, self.role, self.new_list, self.bot.intents.members)
+        if not (to_add or to_remove):
+            return
+
+        async def progress(done, total, failed):
+            await interaction.edit_original_response(
+                content=f"{self.success_message}\nUpdating participant roles... {done}/{total}" + (f" ({failed} failed)" if failed else "")
+            )
+
+        failed = await reconcile.apply(scheduler.get(self.bot), self.role, to_add, to_remove, progress)
+        await interaction.edit_original_response(
+            content=f"{self.success_message}\nParticipant role given to **{len(to_add)}** and removed from **{len(to_remove)}** members" + (f" ({failed} failed)." if failed else ".")
+        )
+
+def log_post_failed(future):
+    """Done-callback for registration log posts, which the click doesn't wait for:
+    the log lane can be minutes behind during a rush."""
+    if not future.cancelled() and future.exception() is not None:
+        errors.report(future.exception(), "registration-log")
+
+class RegisterButton(errors.ReportingView):
+    def __init__(self, bot, roster):
         super().__init__(timeout=None)
         self.bot = bot
-        self.list_file = 'list.json'
-        with open('settings.yaml', 'r') as f:
-            self.settings = yaml.safe_load(f)
+        self.roster = roster
         
     @discord.ui.button(label="Register", style=discord.ButtonStyle.blurple, custom_id="_register")
+    @metrics.timed("button:register")
     async def register_callback(self, interaction: discord.Interaction, button: discord.ui.Button):
         user_id = str(interaction.user.id)
 
         try:
-            with open(self.list_file, 'r') as file:
-                user_list = json.load(file)
-        except (FileNotFoundError, json.JSONDecodeError):
-            user_list = []
-            with open(self.list_file, 'w') as file:
-                json.dump(user_list, file, indent=4)
-
-        if user_id in user_list:
-            confirmation_view = ConfirmCancellationView(user_id, self.list_file, self.bot)
+            added = await self.roster.add(user_id)
+        except RegistrationClosed:
+            await interaction.response.send_message(
+                "Registration for this event is not open.", ephemeral=True
+            )
+            return
+        if added and self.roster.full:
+            self.bot.dispatch('registration_full')
+
+        if not added:
             await interaction.response.send_message(
                 "You've already registered for the event. Do you wish to cancel it?",
-                view=confirmation_view,
+                view=errors.ReportingView(timeout=None).add_item(CancelRegistrationButton(interaction.user.id)),
                 ephemeral=True,
             )
         else:
-            user_list.append(user_id)
-            with open(self.list_file, 'w') as file:
-                json.dump(user_list, file, indent=4)
+            await interaction.response.defer(ephemeral=True, thinking=True)
 
-            guild = interaction.guild
-            participant_role = guild.get_role(self.settings['event_settings']['participant_role'])            
-
-            await interaction.user.add_roles(participant_role)
+            participant_role = interaction.guild.get_role(settings.get().participant_role)
             embed = discord.Embed(description=f"{config.EVENT} {interaction.user.mention} has registered for the event.", color=config.TRANSPARENT)
-            channel = self.bot.get_channel(self.settings['event_settings']['registration_log'])
-            await channel.send(embed=embed)
-            
-            await interaction.response.send_message(
-                "You have been successfully registered for the event.", ephemeral=True
-            )
+            channel = self.bot.get_channel(settings.get().registration_log)
+            rest = scheduler.get(self.bot)
+            rest.send(channel, embed=embed).add_done_callback(log_post_failed)
+            try:
+                await rest.set_role(interaction.user, participant_role, True)
+            except Exception:
+                await interaction.followup.send(
+                    "You have been registered for the event, but the participant role could not be given. Please contact the event team.", ephemeral=True
+                )
+            else:
+                await interaction.followup.send(
+                    "You have been successfully registered for the event.", ephemeral=True
+                )
 
-class ConfirmCancellationView(discord.ui.View):
-    def __init__(self, user_id, list_file, bot):
-        super().__init__(timeout=None)
+class CancelRegistrationButton(discord.ui.DynamicItem[discord.ui.Button], template=r'event:cancel:(?P<user_id>\d+)'):
+    """The "Yes, cancel my registration" button. The user it belongs to is in the
+    custom_id and the roster comes from the cog, so the client keeps one handler
+    for every prompt instead of a view per click."""
+
+    def __init__(self, user_id):
+        super().__init__(discord.ui.Button(label="Yes, cancel my registration", style=discord.ButtonStyle.danger, custom_id=f"event:cancel:{user_id}"))
         self.user_id = user_id
-        self.bot = bot
-        self.list_file = list_file
-        with open('settings.yaml', 'r') as f:
-            self.settings = yaml.safe_load(f)
-        
-    @discord.ui.button(label="Yes, cancel my registration", style=discord.ButtonStyle.danger)
-    async def confirm_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match['user_id']))
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return interaction.user.id == self.user_id
+
+    @metrics.timed("button:cancel-registration")
+    async def callback(self, interaction: discord.Interaction):
         try:
-            with open(self.list_file, 'r') as file:
-                user_list = json.load(file)
-        except (FileNotFoundError, json.JSONDecodeError):
-            user_list = []
-
-        if self.user_id in user_list:
-            user_list.remove(self.user_id)
-            with open(self.list_file, 'w') as file:
-                json.dump(user_list, file, indent=4)
-
-            guild = interaction.guild
-            participant_role = guild.get_role(self.settings['event_settings']['participant_role'])
-            
-            await interaction.user.remove_roles(participant_role)
-            embed = discord.Embed(description=f":x: {interaction.user.mention} has cancelled registration for the event.", color=0xFF0000)
-            channel = self.bot.get_channel(self.settings['event_settings']['registration_log'])
-            await channel.send(embed=embed)
+            await self.cancel(interaction)
+        except Exception as e:
+            # discord.py only logs errors raised by dynamic items
+            await errors.report_interaction(interaction, e, "button:cancel-registration")
+            raise
+
+    async def cancel(self, interaction):
+        bot = interaction.client
+        cog = bot.get_cog('Events')
+        # not this cluster's roster, or the cog is reloading
+        if cog is None or not cog.roster.ready.is_set():
+            await interaction.response.send_message("Registrations can't be changed right now. Please try again in a moment.", ephemeral=True)
+            return
+        removed = await cog.roster.remove(str(self.user_id))
         await interaction.response.edit_message(
             content="Your registration has been cancelled.",
             view=None,
         )
+        if not removed:
+            return
+
+        participant_role = interaction.guild.get_role(settings.get().participant_role)
+        embed = discord.Embed(description=f":x: {interaction.user.mention} has cancelled registration for the event.", color=0xFF0000)
+        channel = bot.get_channel(settings.get().registration_log)
+        rest = scheduler.get(bot)
+        rest.send(channel, embed=embed).add_done_callback(log_post_failed)
+        try:
+            await rest.set_role(interaction.user, participant_role, False)
+        except Exception:
+            await interaction.followup.send(
+                "Your registration has been cancelled, but the participant role could not be removed. Please contact the event team.", ephemeral=True
+            )
 
 async def setup(bot):
     await bot.add_cog(Events(bot))
@@ -1,48 +1,49 @@
-import discord 
+import discord
 from discord import app_commands
-from discord.ext import commands 
-import os
-import config
-import yaml
+from discord.ext import commands
+import time
+from utils import settings
+from utils.command_index import CommandIndex
 
 def get_prefix(bot, message):
-    with open('settings.yaml', 'r') as f:
-        settings = yaml.safe_load(f)
-    
-    prefix = settings.get('prefix', '!')
-    return prefix
-  
+    return settings.get().prefix
+
 class Help(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.index = CommandIndex()
+
+    async def cog_load(self):
+        self.rebuild_index()
+
+    def rebuild_index(self):
+        start_time = time.perf_counter()
+        self.index = CommandIndex.build(self.bot, get_prefix(self.bot, None))
+        print(f"[+] help index — {len(self.index.entries)} commands ({(time.perf_counter() - start_time) * 1000:.1f} ms)")
+
+    def current_index(self):
+        # usage lines embed the prefix, so a prefix change in settings.yaml means re-rendering
+        if self.index.prefix != get_prefix(self.bot, None):
+            self.rebuild_index()
+        return self.index
+
+    @commands.Cog.listener()
+    async def on_extensions_loaded(self):
+        self.rebuild_index()
 
     @app_commands.command(name="help", description="Get all the information about a specific command")
     @app_commands.guild_only()
     @app_commands.describe(command="Select a command")
     async def _help_command(self, interaction: discord.Interaction, command: str):
-        cmd = self.bot.get_command(command)
-        if cmd is None:
+        entry = self.current_index().get(command)
+        if entry is None:
             await interaction.response.send_message(f"Command **{command}** not found.", ephemeral=True)
             return
-
-        desc = cmd.description or "No description available."
-        prefix = get_prefix(self.bot, interaction) if interaction.guild else '!'
-        usage = f"{prefix}{cmd.qualified_name} {cmd.signature}" if cmd.signature else f"/{cmd.qualified_name}"
-        aliases = ", ".join(cmd.aliases) if cmd.aliases else "No aliases."
-        category = cmd.cog_name or "General"
-
-        help_embed = discord.Embed(title=desc, color=config.SECONDARY_COLOR)
-        help_embed.add_field(name="Usage", value=f"`{usage}`", inline=False)
-        help_embed.add_field(name="Aliases", value=aliases, inline=False)
-        help_embed.set_footer(text=f"{category} - {command}")
-        
-        await interaction.response.send_message(embed=help_embed)
+        await interaction.response.send_message(embed=entry.embed)
 
     @_help_command.autocomplete('command')
     async def autocomplete_command(self, interaction: discord.Interaction, current: str):
-        commands_list = [cmd.qualified_name for cmd in self.bot.commands if cmd.qualified_name.startswith(current)]
-        limited_commands_list = commands_list[:20]
-        return [app_commands.Choice(name=cmd, value=cmd) for cmd in limited_commands_list]
+        return [app_commands.Choice(name=key, value=key) for key in self.current_index().search(current)]
 
 async def setup(bot):
     await bot.add_cog(Help(bot))
@@ -1,15 +1,176 @@
+import asyncio
+import discord
 from discord.ext import commands
-import os 
+import os
+import time
+from utils.staff import requires_level
+from utils.join_gate import Blocklist, JoinRules, parse_ids
+from utils import scheduler, settings, errors
+import config
+
+class JoinGate(commands.Cog):
+    required_intents = discord.Intents(guilds=True, members=True)
 
-class AutoKicker(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.target_id = os.environ['WEIRDO']
+        gate = settings.get().join_gate
+        # WEIRDO: extra IDs to block, comma separated
+        self.blocklist = Blocklist(gate.blocklist_file, parse_ids(os.environ.get('WEIRDO')))
+        self.rules = JoinRules(gate, self.blocklist)
+        # guild_id -> {action: {member_id: (member, reason)}}, drained by one flush task per guild
+        self.pending = {}
+        self.flushers = {}
+
+    async def cog_load(self):
+        await self.blocklist.load()
+        self.bot.cluster.handler('reload-blocklist')(self.reload_blocklist)
+
+    async def cog_unload(self):
+        for task in self.flushers.values():
+            task.cancel()
+
+    def gate_config(self):
+        gate = settings.get().join_gate
+        if self.rules.config is not gate:
+            self.rules.configure(gate)
+            if gate.blocklist_file != self.blocklist.path:
+                self.blocklist.path = gate.blocklist_file
+                asyncio.create_task(self.blocklist.load())
+        return gate
+
+    async def reload_blocklist(self):
+        await self.blocklist.load()
+        return len(self.blocklist)
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
-        if member.id == self.target_id:
-            await member.kick(reason="Auto kicked, don't be concerned about it.")
-          
+        if not self.gate_config().enabled:
+            return
+        hit = self.rules.check(member.guild.id, member.id, (member.name, member.global_name), member.avatar is None, time.time(), member.bot)
+        if hit:
+            self.queue(member, *hit)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.rules.forget(guild.id)
+
+    def queue(self, member, action, reason):
+        actions = self.pending.setdefault(member.guild.id, {})
+        actions.setdefault(action, {})[member.id] = (member, reason)
+        task = self.flushers.get(member.guild.id)
+        if task is None or task.done():
+            self.flushers[member.guild.id] = asyncio.create_task(self.flush(member.guild))
+
+    async def flush(self, guild):
+        """Applies the first join's action right away, then whatever queued up meanwhile
+        every ``batch_seconds``, so a join flood becomes a few bulk bans and one alert
+        per batch instead of a request and an alert per member."""
+        while actions := self.pending.pop(guild.id, None):
+            try:
+                await self.apply(guild, actions)
+            except Exception as e:
+                errors.report(e, "join-gate")
+            await asyncio.sleep(settings.get().join_gate.batch_seconds)
+
+    async def apply(self, guild, actions):
+        rest = scheduler.get(self.bot)
+        gate = settings.get().join_gate
+        done = {action: 0 for action in actions}
+        failed = 0
+
+        async def ban(user_ids):
+            nonlocal failed
+            banned, not_banned = await rest.ban_users(guild, user_ids, reason="Join gate")
+            done['ban'] += banned
+            failed += len(not_banned)
+
+        async def kick(member, reason):
+            await rest.submit(scheduler.MODERATION, ('member', guild.id, member.id), lambda: member.kick(reason=f"Join gate: {reason}"))
+            done['kick'] += 1
+
+        async def quarantine(member, role, reason):
+            await rest.set_role(member, role, True, reason=f"Join gate: {reason}", lane=scheduler.MODERATION)
+            done['quarantine'] += 1
+
+        jobs = []
+        if 'ban' in actions:
+            jobs.append(ban(list(actions['ban'])))
+        jobs += [kick(member, reason) for member, reason in actions.get('kick', {}).values()]
+        role = guild.get_role(gate.quarantine_role) if gate.quarantine_role else None
+        if role is not None:
+            jobs += [quarantine(member, role, reason) for member, reason in actions.get('quarantine', {}).values()]
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+        failed += sum(isinstance(result, discord.HTTPException) for result in results)
+        for result in results:
+            if isinstance(result, Exception) and not isinstance(result, discord.HTTPException):
+                raise result
+
+        alert_channel = self.bot.get_channel(settings.get().raid_alerts_channel)
+        if alert_channel is None:
+            return
+        summary = ", ".join(f"{action}: **{count}**" for action, count in done.items())
+        if 'quarantine' in actions and role is None:
+            summary += " (no quarantine_role set)"
+        embed = discord.Embed(title="Join gate", description=summary + (f"\nfailed: **{failed}**" if failed else ""), color=config.PRIMARY_COLOR)
+        listing = "\n".join(f"<@{member_id}> {action} — {reason}" for action, members in actions.items() for member_id, (_, reason) in members.items())
+        embed.add_field(name="Members", value=listing[:1024].rsplit("\n", 1)[0] if len(listing) > 1024 else listing, inline=False)
+        embed.set_footer(text=guild.name)
+        await rest.send(alert_channel, embed=embed, lane=scheduler.MODERATION)
+
+    async def broadcast_reload(self):
+        """Other clusters re-read the blocklist file after a change here."""
+        if self.bot.cluster.clustered:
+            await self.bot.cluster.request('reload-blocklist')
+
+    @commands.command(name="blocklist", aliases=['bl'], usage="<user> (optional)", description="Shows the join blocklist, or whether a user is on it")
+    @requires_level(50)
+    async def _blocklist(self, ctx, user: discord.Object = None):
+        if user is None:
+            gate = self.gate_config()
+            await ctx.reply(
+                f"**{len(self.blocklist)}** blocked IDs ({len(self.blocklist.extra)} from the environment) · `{self.blocklist.path}` · action: {gate.blocklist_action}",
+                allowed_mentions=discord.AllowedMentions.none(),
+            )
+        elif user.id in self.blocklist:
+            await ctx.reply(f"<@{user.id}> is blocked: {self.blocklist.reason(user.id) or 'no reason given'}", allowed_mentions=discord.AllowedMentions.none())
+        else:
+            await ctx.reply(f"<@{user.id}> is not blocked.", allowed_mentions=discord.AllowedMentions.none())
+
+    @commands.command(name="blocklist-add", aliases=['bla'], usage="<users...> <reason> (optional)", description="Blocks users from joining (on every cluster)")
+    @requires_level(50)
+    @commands.has_permissions(ban_members=True)
+    async def _blocklist_add(self, ctx, users: commands.Greedy[discord.Object], *, reason: str = None):
+        if not users:
+            await ctx.reply(f"{config.ERROR} Give at least one user ID or mention.")
+            return
+        added = await self.blocklist.add([user.id for user in users], f"{reason or 'no reason'} (by {ctx.author})")
+        await self.broadcast_reload()
+        await ctx.reply(f"{config.SUCCESS} Blocked **{len(added)}** users ({len(users) - len(added)} already blocked). They're actioned as soon as they join.")
+
+    @commands.command(name="blocklist-remove", aliases=['blr'], usage="<users...>", description="Unblocks users (on every cluster)")
+    @requires_level(50)
+    @commands.has_permissions(ban_members=True)
+    async def _blocklist_remove(self, ctx, users: commands.Greedy[discord.Object]):
+        if not users:
+            await ctx.reply(f"{config.ERROR} Give at least one user ID or mention.")
+            return
+        removed = await self.blocklist.remove([user.id for user in users])
+        await self.broadcast_reload()
+        still = [user.id for user in users if user.id in self.blocklist]
+        message = f"{config.SUCCESS} Unblocked **{len(removed)}** users."
+        if still:
+            message += " Still blocked through the WEIRDO environment variable: " + ", ".join(f"`{user_id}`" for user_id in still)
+        await ctx.reply(message)
+
+    @commands.command(name="blocklist-reload", description="Re-reads the blocklist file after editing it by hand (on every cluster)")
+    @requires_level(50)
+    async def _blocklist_reload(self, ctx):
+        results = await self.bot.cluster.request('reload-blocklist')
+        failures = [f"cluster {cluster_id}: {result['error']}" for cluster_id, result in sorted(results.items()) if isinstance(result, dict)]
+        if failures:
+            await ctx.reply(f"{config.ERROR} " + "\n".join(failures), allowed_mentions=discord.AllowedMentions.none())
+        else:
+            await ctx.reply(f"{config.SUCCESS} Blocklist reloaded: **{len(self.blocklist)}** blocked IDs.")
+
 async def setup(bot):
-    await bot.add_cog(AutoKicker(bot))
+    await bot.add_cog(JoinGate(bot))
@@ -0,0 +1,29 @@
+import discord
+from discord.ext import commands
+from utils import staff
+
+class Permissions(commands.Cog):
+    required_intents = discord.Intents(guilds=True, members=True)
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        if before.roles != after.roles:
+            staff.invalidate(after.guild.id, after.id)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        staff.invalidate(member.guild.id, member.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        staff.invalidate(role.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        staff.invalidate(guild.id)
+
+async def setup(bot):
+    await bot.add_cog(Permissions(bot))
@@ -0,0 +1,25 @@
+import discord
+from discord.ext import commands
+from utils import scheduler
+from utils.staff import is_dev
+import config
+
+class Scheduler(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.scheduler = scheduler.get(bot)  # bot-wide: it keeps running when this cog unloads
+
+    @commands.command(name="rest-stats", aliases=['rq'], description="Shows the outbound REST scheduler queues")
+    @commands.check(is_dev)
+    async def rest_stats(self, ctx):
+        lines = []
+        for lane, stats in self.scheduler.snapshot().items():
+            lines.append(
+                f"**{lane}** — depth `{stats['depth']}` · done `{stats['completed']}` · failed `{stats['failed']}`"
+                f" · coalesced `{stats['coalesced']}`\n-# wait avg {stats['avg_wait_ms']:.1f} ms · max {stats['max_wait_ms']:.1f} ms"
+            )
+        embed = discord.Embed(description="\n".join(lines), color=config.SECONDARY_COLOR)
+        await ctx.reply(embed=embed, allowed_mentions=discord.AllowedMentions.none())
+
+async def setup(bot):
+    await bot.add_cog(Scheduler(bot))
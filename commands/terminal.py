@@ -1,90 +1,203 @@
 import discord
 from discord.ext import commands
-import subprocess
-import textwrap
-from utils.staff import is_dev
 import asyncio
+import io
+import math
+import os
+import signal
+import time
+import uuid
+from utils.staff import is_dev
+from utils import settings
 from urllib.parse import unquote
 
+DEFAULT_TIMEOUT = 60
+EDIT_INTERVAL = 1.5
+EMBED_LIMIT = 1900
+STREAM_LIMIT = 1024 * 1024  # longest output line readline accepts (asyncio's default is 64 KiB)
+
+class ShellExited(Exception):
+    """The shell died before printing the command's exit status (e.g. a syntax error or ``exit``)."""
+
+class ShellSession:
+    """A persistent shell, so cwd and environment carry over between commands."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self.process = None
+        self.running = False
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            os.environ.get('SHELL', '/bin/sh'),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+            limit=STREAM_LIMIT,
+        )
+
+    async def run(self, command, on_output):
+        """Runs ``command`` and feeds stdout/stderr lines to ``on_output`` as they arrive.
+        Returns the exit code. Kills the shell and raises TimeoutError after ``timeout``;
+        any other failure (e.g. a line over ``STREAM_LIMIT``) also kills it, since the
+        unread output would otherwise be taken for the next command's. Raises
+        ShellExited if the shell itself went away; the next command starts a new one."""
+        if self.process is None or self.process.returncode is not None:
+            await self.start()
+        marker = f"__terminal_{uuid.uuid4().hex}__"
+        script = f"{{ {command}\n}} < /dev/null\nprintf '\\n{marker} %s\\n' $?\nprintf '\\n{marker}\\n' >&2\n"
+
+        async def read(stream):
+            while True:
+                line = await stream.readline()
+                if not line:
+                    return None
+                text = line.decode(errors='replace')
+                if text.startswith(marker):
+                    return text[len(marker):].strip()
+                on_output(text)
+
+        self.running = True
+        try:
+            self.process.stdin.write(script.encode())
+            await self.process.stdin.drain()
+            status, _ = await asyncio.wait_for(
+                asyncio.gather(read(self.process.stdout), read(self.process.stderr)),
+                timeout=self.timeout,
+            )
+        except BaseException:
+            self.kill()
+            raise
+        finally:
+            self.running = False
+        if not status:
+            returncode = await self.process.wait()
+            self.process = None
+            raise ShellExited(f"the shell exited with status {returncode}; cwd and environment were reset")
+        return int(status)
+
+    def kill(self):
+        if self.process is not None and self.process.returncode is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.process = None
+
 class Terminal(commands.Cog):
+    required_intents = discord.Intents(guild_messages=True, message_content=True)
+
     def __init__(self, bot):
         self.bot = bot
         self.terminal_sessions = {}
 
-    @commands.command(name="terminal", aliases=["t"], usage="-q (optional)", description="Starts a terminal session")
+    async def cog_unload(self):
+        for session in self.terminal_sessions.values():
+            session.kill()
+
+    @commands.command(name="terminal", aliases=["t"], usage="-q | -k | -t <seconds> (optional)", description="Starts a terminal session")
     @commands.check(is_dev)
     async def terminal(self, ctx, *, args=None):
         user_id = ctx.author.id
+        session = self.terminal_sessions.get(user_id)
 
         if args == "-q":
-            if user_id in self.terminal_sessions:
+            if session:
+                session.kill()
                 del self.terminal_sessions[user_id]
                 await ctx.send("Terminal session ended.")
             else:
                 await ctx.send("You don't have an active terminal session.")
             return
 
-        if user_id not in self.terminal_sessions:
-            self.terminal_sessions[user_id] = True
-            await ctx.send("Terminal session started. Type commands, or `!terminal -q` to quit.")
+        if args == "-k":
+            if session and session.running:
+                session.kill()
+                await ctx.send("Killed the running command. The shell has been restarted.")
+            else:
+                await ctx.send("Nothing is running.")
+            return
+
+        if args and args.startswith("-t"):
+            try:
+                timeout = float(args[2:])
+            except ValueError:
+                timeout = None
+            if timeout is None or not 0 < timeout < math.inf:
+                await ctx.send("Usage: `-t <seconds>` (a positive number)")
+                return
+            if session is None:
+                session = self.terminal_sessions[user_id] = ShellSession()
+            session.timeout = timeout
+            await ctx.send(f"Command timeout set to **{timeout:g}s**.")
+            return
+
+        if session is None:
+            self.terminal_sessions[user_id] = ShellSession()
+            await ctx.send(f"Terminal session started. Type commands, or `{settings.get().prefix}terminal -q` to quit.")
         else:
             await ctx.send("You already have an active terminal session.")
-    
+
     @commands.Cog.listener()
     async def on_message(self, message):
         if message.author.bot:
             return
-        
-        user_id = message.author.id
 
-        if user_id in self.terminal_sessions:
-            if message.content.startswith("!terminal"):
-                return
-            
-            try:
-                command = unquote(message.content)
-                
-                process = subprocess.Popen(
-                    command,
-                    shell=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    stdin=subprocess.PIPE,
-                    text=True
-                )
-
-                output = ""
-                while True:
-                    stdout = process.stdout.readline()
-                    stderr = process.stderr.readline()
-
-                    if stdout:
-                        output += stdout
-                    if stderr:
-                        output += stderr
-
-                    if stdout == "" and stderr == "" and process.poll() is not None:
-                        break
-
-                    await asyncio.sleep(1)
-
-                chunks = textwrap.wrap(output, width=2000)
-
-                for i, chunk in enumerate(chunks):
-                    embed = discord.Embed(
-                        title=f"Terminal Output (Part {i + 1}/{len(chunks)})" if len(chunks) > 1 else "Terminal Output",
-                        description=f"```{chunk}```",
-                        color=0x27272f
-                    )
-                    await message.channel.send(embed=embed)
-
-            except Exception as e:
-                embed = discord.Embed(
-                    title="Error",
-                    description=str(e),
-                    color=discord.Color.red()
-                )
-                await message.channel.send(embed=embed)
+        session = self.terminal_sessions.get(message.author.id)
+        if session is None or not message.content or message.content.startswith(settings.get().prefix):
+            return
+
+        if session.running:
+            await message.channel.send(f"A command is still running. Use `{settings.get().prefix}terminal -k` to kill it.")
+            return
+
+        command = unquote(message.content)
+        output = []
+        state = {'dirty': False}
+
+        def on_output(text):
+            output.append(text)
+            state['dirty'] = True
+
+        def render(title, color=0x27272f):
+            text = "".join(output).rstrip()
+            if len(text) > EMBED_LIMIT:
+                text = "…" + text[-EMBED_LIMIT:]
+            return discord.Embed(title=title, description=f"```{text or ' '}```", color=color)
+
+        live = await message.channel.send(embed=render("Terminal Output (running…)"))
+
+        async def refresh():
+            while True:
+                await asyncio.sleep(EDIT_INTERVAL)
+                if state['dirty']:
+                    state['dirty'] = False
+                    try:
+                        await live.edit(embed=render("Terminal Output (running…)"))
+                    except discord.HTTPException:
+                        pass
+
+        start = time.monotonic()
+        updater = asyncio.create_task(refresh())
+        try:
+            status = await session.run(command, on_output)
+            title, color = f"Terminal Output (exit {status})", 0x27272f
+        except asyncio.TimeoutError:
+            title, color = f"Terminal Output (killed after {session.timeout:g}s)", discord.Color.red()
+        except Exception as e:
+            output.append(f"\n{type(e).__name__}: {e}\nThe shell has been restarted.")
+            title, color = "Error", discord.Color.red()
+        finally:
+            updater.cancel()
+
+        embed = render(title, color)
+        embed.set_footer(text=f"{time.monotonic() - start:.2f}s")
+        full = "".join(output)
+        if len(full.rstrip()) > EMBED_LIMIT:
+            await live.edit(embed=embed, attachments=[discord.File(io.BytesIO(full.encode()), filename="output.txt")])
+        else:
+            await live.edit(embed=embed)
 
 async def setup(bot):
     await bot.add_cog(Terminal(bot))
@@ -1,81 +1,123 @@
 import discord
-from discord.ext import commands
-from discord.ui import View
+from discord.ext import commands, tasks
 import traceback
 import asyncio 
 import time
+import io
 import os 
-import yaml 
 import config
+from utils import settings, metrics, errors
+from utils.gateway import bot_options, missing_intents
+from utils.cluster import Cluster
+from utils.profiling import profile
+from utils.watchdog import Watchdog
 from utils.staff import is_dev
 import web
 
-with open('settings.yaml', 'r') as file:
-  settings = yaml.safe_load(file)        
-  prefix  = settings['prefix']
-  bug_reports_channel = settings['log_channels']['bug_reports']
-        
 #custom_status = discord.CustomActivity(name = "avengers assemble")
-bot = commands.Bot(command_prefix=prefix, case_insensitive=True, intents=discord.Intents.all())
+cluster = Cluster.from_env(settings.get().cluster.home_guild)
+options = dict(command_prefix=settings.get().prefix, case_insensitive=True, tree_cls=metrics.InstrumentedTree, **bot_options(settings.gateway_profile()))
+shards = settings.get().cluster.shards
+if cluster.clustered:
+    bot = commands.AutoShardedBot(shard_count=cluster.shard_count, shard_ids=cluster.shard_ids, **options)
+elif shards:
+    bot = commands.AutoShardedBot(shard_count=None if shards == 'auto' else shards, **options)
+else:
+    bot = commands.Bot(**options)
+bot.cluster = cluster
+health = web.HealthServer(bot)
+metrics.install(bot)
+errors.install(bot)
+
+@settings.subscribe
+def _apply_prefix(new):
+    bot.command_prefix = new.prefix
+
+@tasks.loop(seconds=10)
+async def watch_settings():
+    if settings.reload():
+        print("[~] settings.yaml reloaded")
+
+async def report_stall(behind, stack):
+    channel = bot.get_channel(settings.get().bug_reports_channel)
+    if channel:
+        await channel.send(
+            f"## Event loop stall\nThe loop was blocked for at least **{behind * 1000:.0f} ms**. Stack of the loop thread at the time:",
+            file=discord.File(io.BytesIO(stack.encode()), filename="stall.txt"),
+        )
+
+watchdog_settings = settings.get().watchdog
+watchdog = Watchdog(
+    threshold=watchdog_settings.threshold_ms / 1000,
+    report_interval=watchdog_settings.report_interval_seconds,
+    on_stall=report_stall,
+)
 
 @bot.event
-async def on_ready():
-    print(f"\nConnected to {bot.user}\n")
+async def setup_hook():
+    # runs once per process, unlike on_ready which fires again after every reconnect
+    await health.start()
+    if watchdog_settings.enabled:
+        watchdog.start()
+    watch_settings.start()
+    errors.reporter.start()
+    await cluster.connect()
+    start_time = time.perf_counter()
     await load_extensions()
+    print(f"[~] extensions loaded in {(time.perf_counter() - start_time) * 1000:.0f} ms")
 
-async def load_extensions():
-    for filename in os.listdir('./commands'):
-        if filename.endswith('.py'):
-            try:
-                await bot.load_extension(f'commands.{filename[:-3]}')
-                print(f"[+] {filename[:-3]}.py — online")
-            except commands.ExtensionError as e:
-                print(f"[-] {filename[:-3]} — offline ({e})")
-
-class ReportButton(View):
-    def __init__(self, bot, error_message, guild_id, user_id, username, command_name, original_message):
-        super().__init__(timeout=None)
-        self.bot = bot
-        self.error_message = error_message
-        self.guild_id = guild_id
-        self.user_id = user_id
-        self.username = username
-        self.command_name = command_name
-        self.original_message = original_message  
-    @discord.ui.button(label='Report Bug', style=discord.ButtonStyle.gray, custom_id="bugbtn")
-    async def send_error_report(self, interaction: discord.Interaction, button: discord.ui.Button):
-        report_channel = self.bot.get_channel(bug_reports_channel) 
-        if report_channel:
-            report_content = (
-                f"## Bug Report\n** **\n"
-                f"**Guild:** {self.guild_id}\n"
-                f"**Reporter ID:** {self.user_id}\n"
-                f"**Username:** {self.username}\n"
-                f"**Command used:** `{self.command_name}`\n"
-                f"\n```python\n{self.error_message}\n```"
-            )
-            await report_channel.send(report_content)
-            await interaction.response.send_message("Thank you for reporting the issue!", ephemeral=True)
-            await self.original_message.delete()
+@bot.event
+async def on_ready():
+    print(f"\nConnected to {bot.user}" + (f" (cluster {cluster.id}, shards {cluster.shard_ids})" if cluster.clustered else "") + "\n")
+    health.ready = True
+    # servers that added the bot while it was offline
+    for guild in list(bot.guilds):
+        await leave_if_unlisted(guild)
+
+async def leave_if_unlisted(guild):
+    allowed = settings.get().allowed_servers
+    if allowed and guild.id not in allowed:
+        print(f"[-] leaving {guild.name} ({guild.id}): not in allowed_servers")
+        await guild.leave()
+
+@bot.event
+async def on_guild_join(guild):
+    await leave_if_unlisted(guild)
+
+async def load_extension(name, reload=False):
+    start_time = time.perf_counter()
+    try:
+        if reload and name in bot.extensions:
+            await bot.reload_extension(name)
         else:
-            await interaction.response.send_message("It looks like there was an issue while submitting your report.", ephemeral=True)
+            await bot.load_extension(name)
+    except commands.ExtensionError as e:
+        print(f"[-] {name[9:]} — offline ({e})")
+        return e
+    print(f"[+] {name[9:]}.py — online ({(time.perf_counter() - start_time) * 1000:.0f} ms)")
+    for cog in list(bot.cogs.values()):
+        missing = missing_intents(bot, cog) if cog.__module__ == name else None
+        if missing:
+            print(f"[!] {cog.qualified_name} needs intents that are disabled: {', '.join(missing)}")
+
+async def load_extensions():
+    names = sorted(f'commands.{filename[:-3]}' for filename in os.listdir('./commands') if filename.endswith('.py'))
+    await asyncio.gather(*(load_extension(name) for name in names))
+    bot.dispatch('extensions_loaded')
 
 @bot.event
 async def on_command_error(ctx, error):
+    if ctx.command:
+        metrics.error(ctx.command.qualified_name)
     if isinstance(error, commands.CommandInvokeError):
-        error_message = str(error)
-        guild_id = ctx.guild.id
-        user_id = ctx.author.id
-        username = ctx.author.name
-        command_name = ctx.command.name            
-        view = ReportButton(bot, error_message, guild_id, user_id, username, command_name, ctx.message)
-        
-        error_msg = await ctx.send("Uh oh! Something went wrong. Would you like to report this bug?", view=view)
-        
-        view.original_message = error_msg
+        report = errors.report(error, f"{settings.get().prefix}{ctx.command.qualified_name}", ctx.author.id)
+        if report is None:
+            await ctx.send("Uh oh! Something went wrong.")
+        else:
+            await ctx.send("Uh oh! Something went wrong. Would you like to report this bug?", view=errors.ReportBugButton.view(report.fingerprint))
     else:
-     	await ctx.reply(error, allowed_mentions=discord.AllowedMentions.none())
-     	       
+        await ctx.reply(error, allowed_mentions=discord.AllowedMentions.none())
+
 async def evaluate(ctx, code):
     try:
         result = eval(code)
@@ -92,6 +134,96 @@ async def _sync(ctx):
     synced = await bot.tree.sync()
     await ctx.reply(embed=discord.Embed(description=f"synced **`{len(synced)}`** command(s)", color=config.SECONDARY_COLOR), allowed_mentions=discord.AllowedMentions.none())
 
+@cluster.handler('reload')
+async def cluster_reload(cog):
+    error = await load_extension(f'commands.{cog.removesuffix(".py")}', reload=True)
+    if error:
+        return {'error': str(error)}
+    bot.dispatch('extensions_loaded')
+
+@cluster.handler('reload-settings')
+async def cluster_reload_settings():
+    if not settings.reload(force=True):
+        return {'error': f"settings.yaml not applied: {settings.error}"}
+
+@cluster.handler('stats')
+async def cluster_stats():
+    rss = None
+    try:
+        with open('/proc/self/status') as status:
+            rss = next((int(line.split()[1]) // 1024 for line in status if line.startswith('VmRSS:')), None)
+    except OSError:
+        pass
+    latency = bot.latency
+    return {
+        'shards': cluster.shard_ids,
+        'guilds': len(bot.guilds),
+        'latency_ms': round(latency * 1000, 1) if latency == latency and latency != float('inf') else None,
+        'rss_mb': rss,
+        'commands': sum(stats.latency.count for stats in metrics.commands.values()),
+        'errors': sum(stats.errors for stats in metrics.commands.values()),
+        'home': cluster.is_home,
+    }
+
+def cluster_failures(results):
+    """``"cluster 1: ..."`` lines for the clusters a request failed on."""
+    return [(f"cluster {cluster_id}: " if cluster.clustered else "") + result['error'] for cluster_id, result in sorted(results.items()) if isinstance(result, dict) and 'error' in result]
+
+@bot.command(name="reload", usage="<cog>", description="Reloads a single cog (on every cluster)")
+@commands.check(is_dev)
+async def _reload(ctx, cog: str):
+    start_time = time.perf_counter()
+    failures = cluster_failures(await cluster.request('reload', cog=cog))
+    if failures:
+        await ctx.reply(f"{config.ERROR} " + "\n".join(failures), allowed_mentions=discord.AllowedMentions.none())
+    else:
+        await ctx.reply(embed=discord.Embed(description=f"reloaded **`{cog}`** in {(time.perf_counter() - start_time) * 1000:.0f} ms", color=config.SECONDARY_COLOR), allowed_mentions=discord.AllowedMentions.none())
+
+@bot.command(name="reload-settings", aliases=['rs'], description="Reloads settings.yaml (on every cluster)")
+@commands.check(is_dev)
+async def _reload_settings(ctx):
+    failures = cluster_failures(await cluster.request('reload-settings'))
+    if failures:
+        await ctx.reply(f"{config.ERROR} " + "\n".join(failures), allowed_mentions=discord.AllowedMentions.none())
+    else:
+        await ctx.reply(embed=discord.Embed(description="settings reloaded", color=config.SECONDARY_COLOR), allowed_mentions=discord.AllowedMentions.none())
+
+@bot.command(name="cluster", aliases=['shards'], description="Shows every cluster's shards, guilds, latency and memory")
+@commands.check(is_dev)
+async def _cluster(ctx):
+    results = await cluster.request('stats')
+    lines = []
+    for cluster_id, stats in sorted(results.items()):
+        if 'error' in stats:
+            lines.append(f"**cluster {cluster_id}** · {config.ERROR} {stats['error']}")
+            continue
+        lines.append(
+            f"**cluster {cluster_id}**{' (home)' if stats['home'] else ''} · shards {', '.join(map(str, stats['shards']))}"
+            f" · {stats['guilds']} guilds · {stats['latency_ms']} ms · {stats['rss_mb']} MB"
+            f" · {stats['commands']} commands, {stats['errors']} errors"
+        )
+    embed = discord.Embed(description="\n".join(lines), color=config.SECONDARY_COLOR)
+    embed.set_footer(text=f"{cluster.shard_count} shard(s) · {cluster.count} process(es)")
+    await ctx.reply(embed=embed, allowed_mentions=discord.AllowedMentions.none())
+
+@bot.command(name="stats", description="Shows per-command latency and error stats")
+@commands.check(is_dev)
+async def _stats(ctx):
+    rows = sorted(metrics.commands.items(), key=lambda item: item[1].latency.count, reverse=True)[:15]
+    lines = [
+        f"`{name}` ×{stats.latency.count} · p50 {stats.latency.percentile(0.5) * 1000:.0f} · p95 {stats.latency.percentile(0.95) * 1000:.0f}"
+        f" · p99 {stats.latency.percentile(0.99) * 1000:.0f} ms · rest {stats.rest:.1f}s / local {stats.local:.1f}s · errors {stats.errors}"
+        for name, stats in rows
+    ]
+    embed = discord.Embed(description="\n".join(lines) or "No commands recorded yet.", color=config.SECONDARY_COLOR)
+    lag = metrics.loop_lag
+    embed.set_footer(text=f"loop lag p50 {lag.percentile(0.5) * 1000:.1f} · p99 {lag.percentile(0.99) * 1000:.1f} ms · {watchdog.stalls} stall(s)")
+    if metrics.slow_calls:
+        embed.add_field(name="Slow calls", value="\n".join(
+            f"<t:{int(at)}:R> `{name}` {elapsed:.2f}s (rest {rest:.2f}s)\n-# {args}" for at, name, elapsed, rest, args in list(metrics.slow_calls)[-5:]
+        )[:1024], inline=False)
+    await ctx.reply(embed=embed, allowed_mentions=discord.AllowedMentions.none())
+
 @bot.command(name='evaluate', aliases=['eval', 'e', 'execute', 'exec'], usage="<code>", description="Evaluates your python code", pass_context=True)
 @commands.check(is_dev)
 async def eval_command(ctx, *, code):
@@ -129,11 +261,29 @@ async def eval_command(ctx, *, code):
         await ctx.message.add_reaction('❌')
         await ctx.send(embed=embed)
             
+@bot.command(name='profile', aliases=['prof'], usage="<code>", description="Evaluates your python code under cProfile and tracemalloc")
+@commands.check(is_dev)
+async def profile_command(ctx, *, code):
+    report = await profile(lambda: evaluate(ctx, code))
+    result_str = str(report.result)
+    failed = isinstance(report.result, Exception)
+
+    embed = discord.Embed(description=f"```py\n{result_str[:1000]}\n```", color=0x27272f)
+    embed.set_author(name=f"Profile by {ctx.author.name} - {ctx.author.id}", icon_url=ctx.author.avatar.url if ctx.author.avatar else ctx.author.default_avatar.url)
+    embed.add_field(name="Top functions (cumulative)", value="```\n" + "\n".join(report.top_functions(10))[:1000] + "\n```", inline=False)
+    embed.add_field(name="Top allocations", value="```\n" + ("\n".join(report.top_allocations(5)) or "none")[:1000] + "\n```", inline=False)
+    embed.set_footer(text=f"{report.elapsed * 1000:.2f} ms · {report.stalls} loop stall(s), worst {report.worst_stall * 1000:.1f} ms")
+    if failed:
+        await ctx.message.add_reaction('❌')
+    await ctx.send(embed=embed, files=[
+        discord.File(io.BytesIO(report.pstats_text().encode()), filename="profile.txt"),
+        discord.File(io.BytesIO(report.pstats_dump()), filename="profile.pstats"),
+    ])
+
 @bot.event
 async def on_message(message):
     if not message.author.bot:
         await bot.process_commands(message)
 
-web.keep_alive()
 bot.remove_command('help')
 bot.run(config.TOKEN)                
@@ -0,0 +1,203 @@
+import asyncio
+import itertools
+import json
+import os
+import traceback
+
+REQUEST_TIMEOUT = 10.0
+
+def shard_for(guild_id, shard_count):
+    """The shard Discord delivers ``guild_id``'s events to."""
+    return (guild_id >> 22) % shard_count
+
+def shard_ids(cluster_id, cluster_count, shard_count):
+    """Shards run by ``cluster_id``: every ``cluster_count``-th shard."""
+    return list(range(cluster_id, shard_count, cluster_count))
+
+async def _send(writer, message):
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+
+class Cluster:
+    """This process' place in a cluster started by cluster.py, plus its IPC client.
+
+    Guild events only ever reach the process that runs the guild's shard, so
+    per-guild state (terminal sessions, anti-raid windows, the staff cache)
+    lives there without any routing. Global state such as the event roster is
+    kept by the *home* process — the one that owns ``cluster.home_guild``, or
+    cluster 0 (which also gets DMs) when that isn't set.
+
+    Other processes are reached through the launcher's Unix socket: ``request``
+    runs a named handler on one or all clusters and returns
+    ``{cluster_id: result}``. Without the launcher the bot is a cluster of one,
+    and requests run the local handler directly.
+    """
+
+    def __init__(self, cluster_id=0, cluster_count=1, shard_count=1, socket_path=None, home_guild=None):
+        self.id = cluster_id
+        self.count = cluster_count
+        self.shard_count = shard_count
+        self.shard_ids = shard_ids(cluster_id, cluster_count, shard_count)
+        self.socket_path = socket_path
+        self.home_guild = home_guild
+        self.handlers = {}
+        self._writer = None
+        self._pending = {}
+        self._ids = itertools.count()
+        self._reader_task = None
+
+    @classmethod
+    def from_env(cls, home_guild=None):
+        """The cluster described by the launcher's environment variables, or a cluster of one."""
+        if 'CLUSTER_ID' not in os.environ:
+            return cls(home_guild=home_guild)
+        return cls(
+            int(os.environ['CLUSTER_ID']),
+            int(os.environ['CLUSTER_COUNT']),
+            int(os.environ['SHARD_COUNT']),
+            os.environ['CLUSTER_SOCKET'],
+            home_guild,
+        )
+
+    def owner(self, guild_id):
+        return shard_for(guild_id, self.shard_count) % self.count
+
+    @property
+    def clustered(self):
+        return self.socket_path is not None
+
+    def owns(self, guild_id):
+        return self.owner(guild_id) == self.id
+
+    @property
+    def is_home(self):
+        return self.owns(self.home_guild) if self.home_guild else self.id == 0
+
+    def shards_of(self, cluster_id):
+        return shard_ids(cluster_id, self.count, self.shard_count)
+
+    def handler(self, name):
+        """Registers ``async def handler(**args)`` for requests named ``name``."""
+        def decorator(func):
+            self.handlers[name] = func
+            return func
+        return decorator
+
+    async def connect(self):
+        if not self.clustered:
+            return
+        reader, self._writer = await asyncio.open_unix_connection(self.socket_path)
+        await _send(self._writer, {'op': 'hello', 'cluster': self.id})
+        self._reader_task = asyncio.create_task(self._read(reader))
+
+    async def close(self):
+        if self._reader_task:
+            self._reader_task.cancel()
+        if self._writer:
+            self._writer.close()
+
+    async def request(self, command, target='all', **args):
+        """Runs ``command`` on ``target`` (a cluster ID or ``'all'``). Returns ``{cluster_id: result}``;
+        clusters that failed or timed out map to ``{'error': ...}``."""
+        if not self.clustered:
+            reply = await self._run(command, args)
+            return {self.id: reply.get('result') if 'error' not in reply else reply}
+        request_id = next(self._ids)
+        future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+        try:
+            await _send(self._writer, {'op': 'request', 'id': request_id, 'target': target, 'command': command, 'args': args})
+            results = await asyncio.wait_for(future, REQUEST_TIMEOUT + 1)
+        finally:
+            self._pending.pop(request_id, None)
+        return {int(cluster_id): result for cluster_id, result in results.items()}
+
+    async def _read(self, reader):
+        while line := await reader.readline():
+            message = json.loads(line)
+            if message['op'] == 'call':
+                asyncio.create_task(self._call(message))
+            elif message['op'] == 'results':
+                future = self._pending.get(message['id'])
+                if future and not future.done():
+                    future.set_result(message['results'])
+        print("[-] cluster: lost the connection to the launcher")
+
+    async def _run(self, command, args):
+        func = self.handlers.get(command)
+        try:
+            if func is None:
+                raise LookupError(f"no handler for {command!r}")
+            return {'result': await func(**args)}
+        except Exception as e:
+            traceback.print_exc()
+            return {'error': f"{type(e).__name__}: {e}"}
+
+    async def _call(self, message):
+        reply = await self._run(message['command'], message['args'])
+        await _send(self._writer, {'op': 'reply', 'id': message['id'], **reply})
+
+class Hub:
+    """The launcher's side of the socket: fans requests out to clusters and gathers the replies."""
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self.clusters = {}
+        self._pending = {}
+        self._ids = itertools.count()
+        self.server = None
+
+    async def start(self):
+        os.makedirs(os.path.dirname(self.socket_path) or '.', exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.server = await asyncio.start_unix_server(self._serve, path=self.socket_path)
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        cluster_id = None
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                op = message['op']
+                if op == 'hello':
+                    cluster_id = message['cluster']
+                    self.clusters[cluster_id] = writer
+                elif op == 'request':
+                    asyncio.create_task(self._fan_out(writer, message))
+                elif op == 'reply':
+                    future = self._pending.get(message['id'])
+                    if future and not future.done():
+                        future.set_result({key: value for key, value in message.items() if key in ('result', 'error')})
+        finally:
+            if cluster_id is not None and self.clusters.get(cluster_id) is writer:
+                del self.clusters[cluster_id]
+            writer.close()
+
+    async def _call(self, cluster_id, command, args):
+        writer = self.clusters.get(cluster_id)
+        if writer is None:
+            return {'error': "not connected"}
+        call_id = next(self._ids)
+        future = self._pending[call_id] = asyncio.get_running_loop().create_future()
+        try:
+            await _send(writer, {'op': 'call', 'id': call_id, 'command': command, 'args': args})
+            return await asyncio.wait_for(future, REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            return {'error': "timed out"}
+        except ConnectionError as e:
+            return {'error': str(e)}
+        finally:
+            self._pending.pop(call_id, None)
+
+    async def _fan_out(self, writer, message):
+        targets = sorted(self.clusters) if message['target'] == 'all' else [message['target']]
+        replies = await asyncio.gather(*(self._call(cluster_id, message['command'], message['args']) for cluster_id in targets))
+        results = {cluster_id: reply.get('result') if 'error' not in reply else {'error': reply['error']} for cluster_id, reply in zip(targets, replies)}
+        try:
+            await _send(writer, {'op': 'results', 'id': message['id'], 'results': results})
+        except ConnectionError:
+            pass
@@ -0,0 +1,143 @@
+from collections import OrderedDict
+import discord
+from discord import app_commands
+from discord.ext import commands
+import config
+
+MAX_CHOICES = 25
+MIN_SIMILARITY = 0.3
+QUERY_CACHE_SIZE = 512
+
+def _bigrams(text):
+    text = f" {text} "
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+class Entry:
+    __slots__ = ('key', 'command', 'slash', 'embed')
+
+    def __init__(self, key, command, slash):
+        self.key = key
+        self.command = command
+        self.slash = slash
+        self.embed = None
+
+class CommandIndex:
+    """Lookup structure for /help over prefix and slash commands.
+
+    Names and aliases go into a prefix trie whose nodes keep their best
+    ``MAX_CHOICES`` keys, so a prefix lookup costs O(len(query)). When that
+    doesn't fill the list, substring matches and then bigram (Dice) similarity
+    catch typos. Results are memoised per query until the index is rebuilt,
+    and help embeds are rendered once per command.
+    """
+
+    def __init__(self, prefix='!'):
+        self.prefix = prefix
+        self.entries = {}
+        self._terms = {}  # name or alias -> keys
+        self._aliases = set()
+        self._trie = {}
+        self._grams = {}  # bigram -> terms containing it
+        self._gram_counts = {}
+        self._queries = OrderedDict()
+
+    @classmethod
+    def build(cls, bot, prefix):
+        index = cls(prefix)
+        for command in bot.walk_commands():
+            if command.hidden:
+                continue
+            index._add(command.qualified_name, command, False, command.aliases)
+        for command in bot.tree.walk_commands():
+            if isinstance(command, app_commands.Command):
+                index._add(f"/{command.qualified_name}", command, True, ())
+
+        # shortest names first, aliases after names, so trie nodes keep the likeliest keys
+        terms = sorted(index._terms.items(), key=lambda item: (item[0] in index._aliases, len(item[0]), item[0]))
+        for term, keys in terms:
+            node = index._trie
+            for char in term:
+                node = node.setdefault(char, {})
+                ranked = node.setdefault('', [])
+                for key in keys:
+                    if len(ranked) < MAX_CHOICES and key not in ranked:
+                        ranked.append(key)
+            grams = _bigrams(term)
+            index._gram_counts[term] = len(grams)
+            for gram in grams:
+                index._grams.setdefault(gram, []).append(term)
+        for entry in index.entries.values():
+            entry.embed = index._render(entry)
+        return index
+
+    def _add(self, key, command, slash, aliases):
+        self.entries[key] = Entry(key, command, slash)
+        self._terms.setdefault(command.qualified_name.lower(), []).append(key)
+        for alias in aliases:
+            self._terms.setdefault(alias.lower(), []).append(key)
+            self._aliases.add(alias.lower())
+
+    def _render(self, entry):
+        command = entry.command
+        if entry.slash:
+            params = " ".join(f"<{param.display_name}>" if param.required else f"[{param.display_name}]" for param in command.parameters)
+            usage = f"/{command.qualified_name} {params}".rstrip()
+            aliases = "No aliases."
+            category = command.binding.qualified_name if isinstance(command.binding, commands.Cog) else "General"
+        else:
+            usage = f"{self.prefix}{command.qualified_name} {command.signature}".rstrip()
+            aliases = ", ".join(command.aliases) if command.aliases else "No aliases."
+            category = command.cog_name or "General"
+
+        desc = command.description or "No description available."
+        embed = discord.Embed(title=desc, color=config.SECONDARY_COLOR)
+        embed.add_field(name="Usage", value=f"`{usage}`", inline=False)
+        embed.add_field(name="Aliases", value=aliases, inline=False)
+        embed.set_footer(text=f"{category} - {entry.key}")
+        return embed
+
+    def get(self, key):
+        entry = self.entries.get(key) or self.entries.get(f"/{key}")
+        if entry is None:
+            keys = self._terms.get(key.lower())
+            entry = keys and self.entries[keys[0]]
+        return entry or None
+
+    def search(self, query):
+        """Up to ``MAX_CHOICES`` keys for ``query``: prefix matches, then substrings, then typos."""
+        query = query.strip().lower().removeprefix('/').removeprefix(self.prefix)
+        cached = self._queries.get(query)
+        if cached is not None:
+            self._queries.move_to_end(query)
+            return cached
+
+        node = self._trie
+        for char in query:
+            node = node.get(char)
+            if node is None:
+                break
+        results = list(node.get('', ())) if node is not None else []
+        if not query:
+            results = sorted(self.entries, key=lambda key: key.lstrip('/'))[:MAX_CHOICES]
+
+        if len(results) < MAX_CHOICES and query:
+            seen = set(results)
+            def extend(terms):
+                for term in terms:
+                    for key in self._terms[term]:
+                        if key not in seen and len(results) < MAX_CHOICES:
+                            seen.add(key)
+                            results.append(key)
+            extend(term for term in self._terms if query in term)
+            grams = _bigrams(query)
+            overlap = {}
+            for gram in grams:
+                for term in self._grams.get(gram, ()):
+                    overlap[term] = overlap.get(term, 0) + 1
+            scored = [(2 * shared / (len(grams) + self._gram_counts[term]), term) for term, shared in overlap.items()]
+            extend(term for score, term in sorted(scored, reverse=True) if score >= MIN_SIMILARITY)
+
+        self._queries[query] = results
+        if len(self._queries) > QUERY_CACHE_SIZE:
+            self._queries.popitem(last=False)
+        return results
@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import io
+import os
+import time
+import traceback
+from collections import OrderedDict
+import discord
+from discord import app_commands
+from discord.ext import commands
+from utils import settings, scheduler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FLUSH_INTERVAL = 10.0
+MAX_POSTS_PER_FLUSH = 2  # new reports; the rest wait for the next flush
+MAX_EDITS_PER_FLUSH = 5
+MAX_REPORTS = 200
+MAX_LISTED = 10  # sources / reporters shown on a report
+
+def unwrap(exc):
+    """The exception a command wrapper (CommandInvokeError etc.) is carrying."""
+    while isinstance(exc, (commands.CommandInvokeError, app_commands.CommandInvokeError)) and exc.original is not None:
+        exc = exc.original
+    return exc
+
+def fingerprint(exc):
+    """Identifies a bug by exception type and the code path through this repo.
+
+    Frames are keyed by file, function and source line rather than line
+    numbers, and the message is left out, so the same bug hit by different
+    users (with different IDs in the message) groups into one report.
+    """
+    parts = [f"{type(exc).__module__}.{type(exc).__qualname__}"]
+    frames = traceback.extract_tb(exc.__traceback__)
+    own = [frame for frame in frames if os.path.abspath(frame.filename).startswith(ROOT + os.sep)]
+    for frame in own or frames[-1:]:
+        parts.append(f"{os.path.relpath(frame.filename, ROOT)}:{frame.name}:{(frame.line or '').strip()}")
+    cause = exc.__cause__ or exc.__context__
+    if cause is not None:
+        parts.append(f"caused by {type(cause).__qualname__}")
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()[:12]
+
+class ErrorReport:
+    __slots__ = ('fingerprint', 'title', 'traceback', 'count', 'first_seen', 'last_seen',
+                 'sources', 'users', 'reporters', 'message', 'dirty')
+
+    def __init__(self, fingerprint, exc):
+        self.fingerprint = fingerprint
+        self.title = f"{type(exc).__name__}: {exc}"[:250]
+        self.traceback = "".join(traceback.format_exception(exc))
+        self.count = 0
+        self.first_seen = self.last_seen = time.time()
+        self.sources = OrderedDict()
+        self.users = set()
+        self.reporters = OrderedDict()
+        self.message = None
+        self.dirty = True
+
+    def embed(self):
+        embed = discord.Embed(title=self.title, color=discord.Color.red())
+        embed.add_field(name="Count", value=f"**{self.count}** ({len(self.users)} user(s))")
+        embed.add_field(name="First seen", value=f"<t:{int(self.first_seen)}:f>")
+        embed.add_field(name="Last seen", value=f"<t:{int(self.last_seen)}:R>")
+        embed.add_field(name="Where", value=", ".join(f"`{source}`" for source in list(self.sources)[-MAX_LISTED:])[:1024] or "unknown", inline=False)
+        if self.reporters:
+            embed.add_field(name="Reported by", value=", ".join(f"<@{user_id}>" for user_id in list(self.reporters)[-MAX_LISTED:]), inline=False)
+        embed.set_footer(text=f"fingerprint {self.fingerprint}")
+        return embed
+
+class ErrorReporter:
+    """Collects errors from prefix commands, app commands and components into one
+    report per fingerprint, and keeps one message per report in bug_reports.
+
+    New reports are posted with the full traceback attached; repeats only bump
+    the count, and the message is edited at most once per ``FLUSH_INTERVAL``.
+    Posting goes through the REST scheduler's logging lane, so an error storm
+    can't crowd out moderation or role edits.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.reports = OrderedDict()
+        self._task = None
+
+    def capture(self, exc, source, user_id=None):
+        """Records ``exc`` (unwrapped) and returns its report. An exception that was
+        already captured further down (e.g. by a component wrapper) isn't counted twice."""
+        exc = unwrap(exc)
+        key = fingerprint(exc)
+        report = self.reports.get(key)
+        if getattr(exc, '_error_report', None) is not None:
+            return report or exc._error_report
+        if report is None:
+            report = self.reports[key] = ErrorReport(key, exc)
+            print(f"[!] new error {key} in {source}:\n{report.traceback}", end="")
+            while len(self.reports) > MAX_REPORTS:
+                self.reports.popitem(last=False)
+        else:
+            self.reports.move_to_end(key)
+        report.count += 1
+        report.last_seen = time.time()
+        report.sources[source] = None
+        report.sources.move_to_end(source)
+        if user_id is not None:
+            report.users.add(user_id)
+        report.dirty = True
+        try:
+            exc._error_report = report
+        except AttributeError:
+            pass
+        return report
+
+    def add_reporter(self, key, user_id):
+        report = self.reports.get(key)
+        if report is None:
+            return False
+        report.reporters[user_id] = None
+        report.dirty = True
+        return True
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception:
+                traceback.print_exc()
+
+    async def flush(self):
+        channel = self.bot.get_channel(settings.get().bug_reports_channel)
+        if channel is None:
+            return
+        rest = scheduler.get(self.bot)
+        dirty = sorted((report for report in self.reports.values() if report.dirty), key=lambda report: -report.count)
+        new = [report for report in dirty if report.message is None][:MAX_POSTS_PER_FLUSH]
+        edits = [report for report in dirty if report.message is not None][:MAX_EDITS_PER_FLUSH]
+
+        async def post(report):
+            report.dirty = False
+            file = discord.File(io.BytesIO(report.traceback.encode()), filename=f"traceback-{report.fingerprint}.txt")
+            try:
+                report.message = await rest.send(channel, embed=report.embed(), file=file, allowed_mentions=discord.AllowedMentions.none())
+            except discord.HTTPException:
+                report.dirty = True
+
+        async def edit(report):
+            report.dirty = False
+            message = report.message
+            try:
+                await rest.submit(scheduler.LOGGING, ('channel', channel.id),
+                                  lambda: message.edit(embed=report.embed(), allowed_mentions=discord.AllowedMentions.none()),
+                                  key=('error-report', report.fingerprint))
+            except discord.NotFound:
+                report.message = None  # deleted by hand: post it again
+                report.dirty = True
+            except discord.HTTPException:
+                report.dirty = True
+
+        await asyncio.gather(*map(post, new), *map(edit, edits))
+
+class ReportBugButton(discord.ui.DynamicItem[discord.ui.Button], template=r'error:report:(?P<fingerprint>[0-9a-f]{12})'):
+    """Lets the user who hit an error add themselves to its report. The report's
+    fingerprint is the custom_id, so no view is kept per error message."""
+
+    def __init__(self, key):
+        super().__init__(discord.ui.Button(label='Report Bug', style=discord.ButtonStyle.gray, custom_id=f"error:report:{key}"))
+        self.key = key
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match['fingerprint'])
+
+    @staticmethod
+    def view(key):
+        return ReportingView(timeout=None).add_item(ReportBugButton(key))
+
+    async def callback(self, interaction: discord.Interaction):
+        if reporter is not None and reporter.add_reporter(self.key, interaction.user.id):
+            await interaction.response.edit_message(content="Thank you for reporting the issue!", view=None)
+        else:
+            await interaction.response.send_message("It looks like there was an issue while submitting your report.", ephemeral=True)
+
+reporter = None
+
+class ReportingView(discord.ui.View):
+    """Base for the bot's views: callback errors go to the reporter instead of only the log."""
+
+    async def on_error(self, interaction, error, item):
+        await report_interaction(interaction, error, f"{type(self).__name__}:{getattr(item, 'custom_id', None) or type(item).__name__}")
+
+def install(bot):
+    """Creates the reporter. App commands report from ``InstrumentedTree.on_error``,
+    views through ``ReportingView``, prefix commands from ``on_command_error`` in
+    main.py, and DynamicItem callbacks (which discord.py only logs) through
+    ``report_interaction``."""
+    global reporter
+    reporter = bot.error_reporter = ErrorReporter(bot)
+    bot.add_dynamic_items(ReportBugButton)
+    return reporter
+
+def report(exc, source, user_id=None):
+    if reporter is not None:
+        return reporter.capture(exc, source, user_id)
+
+async def report_interaction(interaction, exc, source):
+    """Captures ``exc`` and tells the user, with a button to add themselves to the report."""
+    entry = report(exc, source, interaction.user.id)
+    if entry is None:
+        return
+    view = ReportBugButton.view(entry.fingerprint)
+    content = "Uh oh! Something went wrong. Would you like to report this bug?"
+    try:
+        if interaction.response.is_done():
+            await interaction.followup.send(content, view=view, ephemeral=True)
+        else:
+            await interaction.response.send_message(content, view=view, ephemeral=True)
+    except discord.HTTPException:
+        pass
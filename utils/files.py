@@ -0,0 +1,25 @@
+import os
+import tempfile
+
+def atomic_write(path, text, sync=False):
+    """Replaces ``path`` with ``text`` through a uniquely named temp file in the same
+    directory, so readers see the old or the new contents and never half a file,
+    and two writers at once can't clobber each other's temp file. ``sync`` also
+    fsyncs before the rename, for files that must survive a power cut."""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    name = os.path.basename(path)
+    fd, tmp_file = tempfile.mkstemp(dir=directory, prefix=f'.{name}-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as file:
+            file.write(text)
+            if sync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(tmp_file, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_file)
+        except FileNotFoundError:
+            pass
+        raise
@@ -0,0 +1,29 @@
+import discord
+
+def bot_options(profile):
+    """Turns a settings.yaml gateway profile into discord.py client options."""
+    if profile.intents == 'all':
+        intents = discord.Intents.all()
+    else:
+        intents = discord.Intents(**{name: True for name in profile.intents})
+
+    if profile.member_cache == 'all':
+        member_cache_flags = discord.MemberCacheFlags.all()
+    else:
+        member_cache_flags = discord.MemberCacheFlags.none()
+        for flag in profile.member_cache:
+            setattr(member_cache_flags, flag, True)
+
+    return {
+        'intents': intents,
+        'member_cache_flags': member_cache_flags,
+        'max_messages': profile.max_messages,
+        'chunk_guilds_at_startup': profile.chunk_guilds_at_startup,
+    }
+
+def missing_intents(bot, cog):
+    """Names of intents a cog declares in ``required_intents`` that the bot runs without."""
+    required = getattr(cog, 'required_intents', None)
+    if required is None:
+        return []
+    return [name for name, enabled in required if enabled and not getattr(bot.intents, name)]
@@ -0,0 +1,226 @@
+import heapq
+import json
+import math
+import random
+import re
+import time
+from utils.files import atomic_write
+
+TEAMS_FILE = 'cache/teams.json'
+ID_RE = re.compile(r'\d{15,20}')
+
+def parse_pairs(text):
+    """Parses ``"@a @b, @c @d"`` (mentions or raw IDs) into ``[['a', 'b'], ['c', 'd']]``."""
+    if not text:
+        return []
+    groups = [ID_RE.findall(part) for part in re.split(r'[,;\n]', text)]
+    return [group for group in groups if len(group) > 1]
+
+def form_teams(participants, teams=None, team_size=None, seed=None, ratings=None, together=(), apart=()):
+    """Splits ``participants`` into ``teams`` (or teams of ``team_size``).
+
+    Participants are shuffled with ``seed``; ``together`` groups are kept in one
+    team and ``apart`` groups are spread over different teams. With ``ratings``,
+    units are placed highest first onto the team with the lowest total (greedy
+    LPT), which keeps team totals close.
+
+    Without ``apart`` groups, team sizes never differ by more than one unless a
+    big ``together`` group leaves no balanced split. With them, balance is
+    best-effort: units that clash with every team that has room are swapped in,
+    and a last pass moves or swaps units between the largest and smallest team,
+    but a balanced split that needs a longer chain of moves can be missed. Runs
+    in O(n log teams), plus those linear searches when a unit clashes or sizes
+    end up uneven. Raises ValueError when no placement that keeps every ``apart``
+    group split up was found.
+    """
+    n = len(participants)
+    if team_size:
+        teams = math.ceil(n / team_size)
+    if not teams or teams < 1:
+        raise ValueError("The number of teams must be at least one.")
+    if teams > n:
+        raise ValueError("There are fewer participants than teams.")
+
+    rng = random.Random(seed)
+    order = list(participants)
+    rng.shuffle(order)
+
+    # union-find over "together" groups
+    parent = {member: member for member in order}
+    def find(member):
+        while parent[member] != member:
+            parent[member] = parent[parent[member]]
+            member = parent[member]
+        return member
+    for group in together:
+        group = [member for member in group if member in parent]
+        for member in group[1:]:
+            parent[find(member)] = find(group[0])
+
+    blocks = {}
+    for member in order:
+        blocks.setdefault(find(member), []).append(member)
+
+    conflicts = {}
+    for group in apart:
+        group = [member for member in group if member in parent]
+        roots = [find(member) for member in group]
+        if len(set(roots)) < len(roots):
+            raise ValueError("Members who must be kept apart are also in the same together group.")
+        for member in group:
+            conflicts.setdefault(member, set()).update(other for other in group if other != member)
+
+    ratings = ratings or {}
+    known = [ratings[member] for member in order if member in ratings]
+    default = sum(known) / len(known) if known else 0.0
+    units = [(sum(ratings.get(member, default) for member in block), block) for block in blocks.values()]
+    if known:
+        units.sort(key=lambda unit: (-unit[0], -len(unit[1])))
+    else:
+        units.sort(key=lambda unit: -len(unit[1]))
+    # units with "apart" conflicts go first, most conflicted first, while every team
+    # still has room; placed last, one could find its only open team clashing and
+    # overflow a full one
+    degree = {id(block): sum(len(conflicts.get(member, ())) for member in block) for _, block in units}
+    units.sort(key=lambda unit: -degree[id(unit[1])] if degree[id(unit[1])] else 0)
+
+    small = n // teams
+    big_slots = n - small * teams  # how many teams may end up one larger
+    result = [[] for _ in range(teams)]
+    members = [set() for _ in range(teams)]
+    totals = [0.0] * teams
+    placed = [[] for _ in range(teams)]  # (total, block) per team, for swap repair
+    heap = [(0.0, 0, i) for i in range(teams)]
+    full = []  # teams that can't take anyone else without breaking the size balance
+
+    def current(entry):
+        # entries go stale when a swap changes a team; the fresh one is in the heap
+        return entry[0] == totals[entry[2]] and entry[1] == len(result[entry[2]])
+
+    def clashes(block, i, ignore=()):
+        return any(member in conflicts and (conflicts[member] & members[i]) - set(ignore) for member in block)
+
+    def fits(size, block):
+        new_size = size + len(block)
+        return new_size <= small or (new_size == small + 1 and big_slots > 0)
+
+    def swap(total, block, open_teams):
+        """Makes room for ``block`` when every team with space clashes with it: moves a
+        same-sized unit from another team into one of those, and ``block`` takes its place."""
+        for _, _, i in sorted(open_teams):
+            for j in range(teams):
+                if j == i:
+                    continue
+                for unit in placed[j]:
+                    other_total, other = unit
+                    if len(other) != len(block) or clashes(other, i) or clashes(block, j, ignore=other):
+                        continue
+                    placed[j].remove(unit)
+                    result[j] = [member for member in result[j] if member not in other] + block
+                    members[j].difference_update(other)
+                    members[j].update(block)
+                    totals[j] += total - other_total
+                    placed[j].append((total, block))
+                    heapq.heappush(heap, (totals[j], len(result[j]), j))
+                    return (totals[i], len(result[i]), i), other_total, other
+        return None
+
+    for total, block in units:
+        skipped = []
+        choice = fallback = None
+        while heap:
+            entry = heapq.heappop(heap)
+            if not current(entry):
+                continue
+            _, size, i = entry
+            if size > small or (size == small and big_slots <= 0):
+                full.append(entry)
+                continue
+            if clashes(block, i):
+                skipped.append(entry)
+                continue
+            if fits(size, block):
+                choice = entry
+                break
+            skipped.append(entry)
+            if fallback is None:
+                fallback = entry
+        skipped = [entry for entry in skipped if current(entry)]
+        full = [entry for entry in full if current(entry)]
+        if choice is None:
+            swapped = swap(total, block, [entry for entry in skipped if fits(entry[1], block)])
+            if swapped is not None:
+                # the displaced unit goes where ``block`` was headed
+                choice, total, block = swapped
+                skipped.remove(choice)
+        if choice is None:
+            # only a "together" group can overflow every team; put it on the lightest one
+            if fallback is None or not current(fallback):
+                fallback = min((entry for entry in full if not clashes(block, entry[2])), default=None)
+                if fallback is None:
+                    raise ValueError("Couldn't find teams that keep every apart group split up. Try more teams or fewer constraints.")
+                full.remove(fallback)
+            else:
+                skipped.remove(fallback)
+            choice = fallback
+
+        _, size, i = choice
+        new_size = size + len(block)
+        if size <= small < new_size:
+            big_slots -= 1
+        result[i].extend(block)
+        members[i].update(block)
+        totals[i] += total
+        placed[i].append((total, block))
+        heapq.heappush(heap, (totals[i], new_size, i))
+        for entry in skipped:
+            if current(entry):
+                heapq.heappush(heap, entry)
+
+    def move(unit, i, j):
+        total, block = unit
+        placed[i].remove(unit)
+        placed[j].append(unit)
+        result[i] = [member for member in result[i] if member not in block]
+        result[j].extend(block)
+        members[i].difference_update(block)
+        members[j].update(block)
+        totals[i] -= total
+        totals[j] += total
+
+    def rebalance(i, j, gap):
+        """Moves a unit from team ``i`` to the smaller team ``j``, or swaps it for a
+        smaller unit of ``j``, so their sizes get closer. Returns False if none can."""
+        for unit in placed[i]:
+            for other in [None] + placed[j]:
+                back = other[1] if other else []
+                if not 0 < len(unit[1]) - len(back) < gap:
+                    continue
+                if clashes(unit[1], j, ignore=back) or clashes(back, i, ignore=unit[1]):
+                    continue
+                move(unit, i, j)
+                if other:
+                    move(other, j, i)
+                return True
+        return False
+
+    # greedy placement can leave a team short when "apart" groups pushed units
+    # elsewhere; every step shrinks the sum of squared sizes, so this ends
+    while True:
+        largest = max(range(teams), key=lambda i: len(result[i]))
+        smallest = min(range(teams), key=lambda i: len(result[i]))
+        gap = len(result[largest]) - len(result[smallest])
+        if gap <= 1 or not rebalance(largest, smallest, gap):
+            break
+    return result
+
+def save_teams(teams, seed=None, path=TEAMS_FILE):
+    # two /group runs may save at the same time; each gets its own temp file
+    atomic_write(path, json.dumps({'created_at': int(time.time()), 'seed': seed, 'teams': teams}, indent=4))
+
+def load_teams(path=TEAMS_FILE):
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
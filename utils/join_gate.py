@@ -0,0 +1,156 @@
+import asyncio
+import re
+from collections import deque
+from utils.files import atomic_write
+
+DISCORD_EPOCH = 1420070400000
+
+def created_at(user_id):
+    """Account creation time (unix seconds), straight from the snowflake."""
+    return ((user_id >> 22) + DISCORD_EPOCH) / 1000
+
+def parse_ids(text):
+    """User IDs from a comma or whitespace separated string, e.g. the WEIRDO environment variable."""
+    return [int(part) for part in re.split(r'[\s,]+', text or '') if part.isdigit()]
+
+def compile_names(patterns):
+    """One case-insensitive regex matching any of ``patterns``, or None if there are none.
+    Raises ValueError naming the pattern that doesn't compile."""
+    if not patterns:
+        return None
+    for pattern in patterns:
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"bad name pattern {pattern!r}: {e}") from None
+    try:
+        return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+    except re.error as e:  # e.g. inline flags, which are only allowed at the very start
+        raise ValueError(f"bad name patterns: {e}") from None
+
+class Blocklist:
+    """User IDs that are actioned as soon as they join, in a set for O(1) lookups.
+
+    The file has one ID per line, optionally followed by ``# reason``, and is
+    rewritten atomically on every change. ``extra`` IDs (from the environment)
+    are blocked too but never written to the file.
+    """
+
+    def __init__(self, path, extra=()):
+        self.path = path
+        self.extra = frozenset(extra)
+        self.reasons = {}  # user_id -> reason or None, in file order
+        self.ids = set(self.extra)
+        self._lock = asyncio.Lock()
+
+    def __contains__(self, user_id):
+        return user_id in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def reason(self, user_id):
+        return self.reasons.get(user_id) or ("environment" if user_id in self.extra else None)
+
+    async def load(self):
+        self.reasons = await asyncio.to_thread(self._read)
+        self.ids = set(self.reasons) | self.extra
+
+    def _read(self):
+        reasons = {}
+        try:
+            with open(self.path, 'r') as file:
+                for line in file:
+                    entry, _, reason = line.partition('#')
+                    entry = entry.strip()
+                    if entry.isdigit():
+                        reasons[int(entry)] = reason.strip() or None
+        except FileNotFoundError:
+            pass
+        return reasons
+
+    async def add(self, user_ids, reason=None):
+        """Blocks ``user_ids``; returns the ones that weren't blocked yet."""
+        added = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in self.reasons]
+        reason = " ".join(reason.split()) if reason else None  # one line per entry
+        for user_id in added:
+            self.reasons[user_id] = reason
+            self.ids.add(user_id)
+        if added:
+            await self.save()
+        return added
+
+    async def remove(self, user_ids):
+        """Unblocks ``user_ids``; returns the ones that were in the file."""
+        removed = [user_id for user_id in dict.fromkeys(user_ids) if user_id in self.reasons]
+        for user_id in removed:
+            del self.reasons[user_id]
+            if user_id not in self.extra:
+                self.ids.discard(user_id)
+        if removed:
+            await self.save()
+        return removed
+
+    async def save(self):
+        async with self._lock:
+            text = "".join(f"{user_id} # {reason}\n" if reason else f"{user_id}\n" for user_id, reason in self.reasons.items())
+            await asyncio.to_thread(self._write, text)
+
+    def _write(self, text):
+        atomic_write(self.path, text)
+
+class JoinRules:
+    """Decides what happens to a member who joins.
+
+    Rules run in a fixed order (blocklist, name patterns, account age, default
+    avatar, join burst) and the first one that matches wins. Each is a set
+    lookup, a comparison or one precompiled regex, so a join is checked in a
+    few microseconds even during a flood. A rule whose action is None is off.
+    """
+
+    def __init__(self, config, blocklist):
+        self.blocklist = blocklist
+        self._joins = {}  # guild_id -> deque of recent join times
+        self.configure(config)
+
+    def configure(self, config):
+        names = compile_names(config.name_patterns)  # raises before anything changes
+        self.config = config
+        self.names = names
+        self._joins.clear()  # deque sizes follow burst_joins
+
+    def _burst(self, guild_id, now):
+        config = self.config
+        if not config.burst_joins:
+            return False
+        joins = self._joins.get(guild_id)
+        if joins is None:
+            joins = self._joins[guild_id] = deque(maxlen=config.burst_joins)
+        joins.append(now)
+        return len(joins) == config.burst_joins and now - joins[0] <= config.burst_window_seconds
+
+    def check(self, guild_id, user_id, names, default_avatar, now, bot=False):
+        """Returns ``(action, reason)`` for a joining member, or None to let them in.
+        ``names`` are the username and global name; bots are only checked against the blocklist."""
+        config = self.config
+        burst = self._burst(guild_id, now)  # every join counts towards the rate
+        if config.blocklist_action and user_id in self.blocklist:
+            return config.blocklist_action, f"blocklisted ({self.blocklist.reason(user_id) or 'no reason'})"
+        if bot:
+            return None
+        if self.names is not None and config.name_action:
+            for name in names:
+                if name and self.names.search(name):
+                    return config.name_action, f"name matches a blocked pattern ({name})"
+        if config.account_age_action and config.min_account_age_hours:
+            age = now - created_at(user_id)
+            if age < config.min_account_age_hours * 3600:
+                return config.account_age_action, f"account is {age / 3600:.1f}h old"
+        if config.default_avatar_action and default_avatar:
+            return config.default_avatar_action, "default avatar"
+        if config.burst_action and burst:
+            return config.burst_action, f"{config.burst_joins} joins within {config.burst_window_seconds:g}s"
+        return None
+
+    def forget(self, guild_id):
+        self._joins.pop(guild_id, None)
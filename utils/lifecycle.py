@@ -0,0 +1,121 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+import json
+import re
+import time
+from utils.files import atomic_write
+
+SCHEDULES_FILE = 'cache/schedules.json'
+DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(d|h|m|s)')
+UNITS = {'d': 86400, 'h': 3600, 'm': 60, 's': 1}
+
+def parse_duration(text):
+    """``"1d 2h"``, ``"90m"``, ``"1h30m"`` -> seconds."""
+    text = text.strip().lower()
+    parts = DURATION_RE.findall(text)
+    if not parts or DURATION_RE.sub('', text).strip():
+        raise ValueError(f"`{text}` is not a duration like `2h` or `1d 30m`.")
+    return sum(float(amount) * UNITS[unit] for amount, unit in parts)
+
+def parse_time(text, now=None):
+    """A point in time as a unix timestamp. Accepts ``in 2h`` / ``2h`` (relative),
+    a unix timestamp or ``<t:...>`` Discord timestamp, and ``YYYY-MM-DD HH:MM`` (UTC)."""
+    now = time.time() if now is None else now
+    text = text.strip()
+    match = re.fullmatch(r'<t:(\d+)(?::\w)?>|(\d{9,11})', text)
+    if match:
+        return float(match.group(1) or match.group(2))
+    try:
+        moment = datetime.datetime.fromisoformat(text)
+    except ValueError:
+        return now + parse_duration(text.removeprefix('in '))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.timestamp()
+
+class Lifecycle:
+    """Runs the event's scheduled steps (open, reminders, close) from one task.
+
+    Timers sit in a heap ordered by due time; the task sleeps until the
+    earliest one or until a new timer is added. The event and its pending
+    timers are saved to ``schedules.json`` on every change, so a restart picks
+    them up again; timers that came due while the bot was down fire straight
+    away with how late they are, and ``handler(kind, late)`` decides what a
+    late step still means.
+    """
+
+    def __init__(self, handler, path=SCHEDULES_FILE):
+        self.handler = handler
+        self.path = path
+        self.event = None
+        self._heap = []
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._task = None
+
+    @property
+    def timers(self):
+        return sorted((due, kind) for due, _, kind in self._heap)
+
+    async def load(self):
+        data = await asyncio.to_thread(self._read)
+        self.event = data.get('event')
+        self._heap = [(timer['due'], next(self._seq), timer['kind']) for timer in data.get('timers', [])]
+        heapq.heapify(self._heap)
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    async def save(self):
+        data = {'event': self.event, 'timers': [{'due': due, 'kind': kind} for due, kind in self.timers]}
+        await asyncio.to_thread(self._write, data)
+
+    def _write(self, data):
+        atomic_write(self.path, json.dumps(data, indent=4))
+
+    async def schedule(self, event, timers):
+        """Replaces the current event and its timers with ``event`` and ``[(due, kind), ...]``."""
+        self.event = event
+        self._heap = [(due, next(self._seq), kind) for due, kind in timers]
+        heapq.heapify(self._heap)
+        await self.save()
+        self._wake.set()
+
+    async def clear_timers(self):
+        self._heap.clear()
+        await self.save()
+        self._wake.set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            if not self._heap:
+                await self._wake.wait()
+                continue
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, kind = heapq.heappop(self._heap)
+            await self.save()
+            try:
+                await self.handler(kind, -delay)
+            except Exception as e:
+                print(f"[-] event {kind} step failed: {e!r}")
@@ -0,0 +1,27 @@
+QUERY_LIMIT = 100
+
+async def resolve_members(guild, user_ids, members_intent):
+    """Resolves IDs to members from the cache, fetching the misses over the gateway
+    in batches of 100 instead of one REST call each (only possible with the members
+    intent, ``client.intents.members``). Returns {user_id: member}."""
+    members = {}
+    missing = []
+    for user_id in user_ids:
+        member = guild.get_member(user_id)
+        if member is None:
+            missing.append(user_id)
+        else:
+            members[user_id] = member
+
+    if missing and not guild.chunked and members_intent:
+        for i in range(0, len(missing), QUERY_LIMIT):
+            batch = missing[i:i + QUERY_LIMIT]
+            for member in await guild.query_members(user_ids=batch, limit=QUERY_LIMIT, cache=True):
+                members[member.id] = member
+    return members
+
+async def ensure_chunked(guild, members_intent):
+    """Chunks the guild's members on demand, so the member cache (and role.members) is complete.
+    Without the members intent (``client.intents.members``) there is nothing to chunk with."""
+    if not guild.chunked and members_intent:
+        await guild.chunk(cache=True)
@@ -0,0 +1,98 @@
+from collections import OrderedDict, deque
+
+class _Channel:
+    __slots__ = ('guild_id', 'entries', 'by_message', 'by_hash')
+
+    def __init__(self, guild_id, capacity):
+        self.guild_id = guild_id
+        self.entries = deque(maxlen=capacity)  # (message_id, author_id, timestamp, content_hash)
+        self.by_message = {}  # message_id -> entry, live messages only
+        self.by_hash = {}  # content_hash -> {author_id: live messages}
+
+class MessageIndex:
+    """Fixed-size ring buffer of recent messages per channel with a content-hash -> authors index.
+
+    ``capacities`` overrides ``default_capacity`` per channel (0 disables indexing).
+    Once ``max_entries`` is reached across all channels, the least recently active
+    channel gives up its oldest entries first.
+    """
+
+    def __init__(self, default_capacity=1000, capacities=None, max_entries=100_000):
+        self.default_capacity = default_capacity
+        self.capacities = capacities or {}
+        self.max_entries = max_entries
+        self.size = 0
+        self._channels = OrderedDict()
+
+    def configure(self, default_capacity, capacities, max_entries):
+        self.default_capacity, self.capacities, self.max_entries = default_capacity, capacities, max_entries
+
+    def add(self, guild_id, channel_id, message_id, author_id, timestamp, content_hash):
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            capacity = self.capacities.get(channel_id, self.default_capacity)
+            if not capacity:
+                return
+            channel = self._channels[channel_id] = _Channel(guild_id, capacity)
+        else:
+            self._channels.move_to_end(channel_id)
+
+        if len(channel.entries) == channel.entries.maxlen:
+            self._drop(channel, channel.entries.popleft())
+        entry = (message_id, author_id, timestamp, content_hash)
+        channel.entries.append(entry)
+        channel.by_message[message_id] = entry
+        counts = channel.by_hash.setdefault(content_hash, {})
+        counts[author_id] = counts.get(author_id, 0) + 1
+        self.size += 1
+
+        while self.size > self.max_entries:
+            oldest_id, oldest = next(iter(self._channels.items()))
+            if oldest.entries:
+                self._drop(oldest, oldest.entries.popleft())
+            if not oldest.entries:
+                del self._channels[oldest_id]
+
+    def _drop(self, channel, entry):
+        self.size -= 1
+        if channel.by_message.pop(entry[0], None) is not None:
+            self._forget(channel, entry)
+
+    def _forget(self, channel, entry):
+        _, author_id, _, content_hash = entry
+        counts = channel.by_hash[content_hash]
+        if counts[author_id] == 1:
+            del counts[author_id]
+            if not counts:
+                del channel.by_hash[content_hash]
+        else:
+            counts[author_id] -= 1
+
+    def delete(self, channel_id, message_id):
+        channel = self._channels.get(channel_id)
+        if channel is not None:
+            entry = channel.by_message.pop(message_id, None)
+            if entry is not None:
+                self._forget(channel, entry)
+
+    def forget_channel(self, channel_id):
+        channel = self._channels.pop(channel_id, None)
+        if channel is not None:
+            self.size -= len(channel.entries)
+
+    def channels(self, guild_id):
+        return [channel_id for channel_id, channel in self._channels.items() if channel.guild_id == guild_id]
+
+    def message_count(self, channel_ids):
+        return sum(len(self._channels[channel_id].by_message) for channel_id in channel_ids if channel_id in self._channels)
+
+    def authors(self, content_hash, channel_ids):
+        """Returns {author_id: messages} for live messages with ``content_hash`` in ``channel_ids``."""
+        authors = {}
+        for channel_id in channel_ids:
+            channel = self._channels.get(channel_id)
+            counts = channel and channel.by_hash.get(content_hash)
+            if counts:
+                for author_id, count in counts.items():
+                    authors[author_id] = authors.get(author_id, 0) + count
+        return authors
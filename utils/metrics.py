@@ -0,0 +1,176 @@
+import contextvars
+import functools
+import time
+from collections import deque
+from discord import app_commands
+import discord
+from utils import errors  # errors -> scheduler -> metrics: only used at call time
+
+# upper bounds in seconds, roughly log-spaced
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float('inf'))
+SLOW_THRESHOLD = 2.0
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += value
+
+    def percentile(self, q):
+        """Estimates the ``q`` quantile by interpolating inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if BUCKETS[i] != float('inf') else lower * 2
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return BUCKETS[-2]
+
+class CommandStats:
+    __slots__ = ('latency', 'errors', 'rest', 'local')
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.rest = 0.0
+        self.local = 0.0
+
+commands = {}
+slow_calls = deque(maxlen=50)
+loop_lag = Histogram()
+_rest_time = contextvars.ContextVar('rest_time', default=None)
+
+def current_rest():
+    """The REST-time accumulator of the command running in this task, if any."""
+    return _rest_time.get()
+
+def stats_for(name):
+    stats = commands.get(name)
+    if stats is None:
+        stats = commands[name] = CommandStats()
+    return stats
+
+def begin():
+    """Starts timing the current task. REST calls made from it are added up separately."""
+    rest = [0.0]
+    _rest_time.set(rest)
+    return time.perf_counter(), rest
+
+def finish(name, started, args=None):
+    start, rest = started
+    elapsed = time.perf_counter() - start
+    stats = stats_for(name)
+    stats.latency.observe(elapsed)
+    stats.rest += rest[0]
+    stats.local += max(elapsed - rest[0], 0.0)
+    if elapsed > SLOW_THRESHOLD:
+        slow_calls.append((time.time(), name, elapsed, rest[0], str(args)[:200]))
+        print(f"[!] slow call: {name} took {elapsed:.2f}s (rest {rest[0]:.2f}s) {str(args)[:200]}")
+
+def error(name):
+    stats_for(name).errors += 1
+
+def timed(name):
+    """Times a component callback: ``(self, interaction, item)`` on a View, ``(self, interaction)`` on a DynamicItem."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, interaction, *args):
+            started = begin()
+            try:
+                return await func(self, interaction, *args)
+            except Exception:
+                error(name)
+                raise
+            finally:
+                finish(name, started, interaction.data.get('custom_id'))
+        return wrapper
+    return decorator
+
+class InstrumentedTree(app_commands.CommandTree):
+    async def _call(self, interaction):
+        name = "/" + interaction.data.get('name', '?')
+        if interaction.type is discord.InteractionType.autocomplete:
+            name = "autocomplete:" + name
+        started = begin()
+        try:
+            await super()._call(interaction)
+        finally:
+            finish(name, started, interaction.data.get('options'))
+
+    async def on_error(self, interaction, exc):
+        name = "/" + interaction.data.get('name', '?')
+        error(name)
+        await super().on_error(interaction, exc)
+        # check failures, cooldowns etc. are expected; anything else is a bug
+        if isinstance(exc, app_commands.CommandInvokeError) or not isinstance(exc, app_commands.AppCommandError):
+            await errors.report_interaction(interaction, exc, name)
+
+def install(bot):
+    """Hooks prefix command invocation and REST timing into ``bot``."""
+    request = bot.http.request
+
+    async def timed_request(*args, **kwargs):
+        rest = _rest_time.get()
+        if rest is None:
+            return await request(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return await request(*args, **kwargs)
+        finally:
+            rest[0] += time.perf_counter() - start
+
+    bot.http.request = timed_request
+
+    @bot.before_invoke
+    async def _before(ctx):
+        ctx.metrics_started = begin()
+
+    @bot.after_invoke
+    async def _after(ctx):
+        started = getattr(ctx, 'metrics_started', None)
+        if started:
+            finish(ctx.command.qualified_name, started, ctx.message.content)
+
+def render():
+    """Prometheus text exposition of the command metrics."""
+    lines = [
+        "# TYPE citadel_command_duration_seconds histogram",
+    ]
+    rows = [(name.replace('\\', '\\\\').replace('"', '\\"'), stats) for name, stats in sorted(commands.items())]
+    for label, stats in rows:
+        cumulative = 0
+        for bound, count in zip(BUCKETS, stats.latency.counts):
+            cumulative += count
+            le = "+Inf" if bound == float('inf') else f"{bound:g}"
+            lines.append(f'citadel_command_duration_seconds_bucket{{command="{label}",le="{le}"}} {cumulative}')
+        lines.append(f'citadel_command_duration_seconds_sum{{command="{label}"}} {stats.latency.total:.6f}')
+        lines.append(f'citadel_command_duration_seconds_count{{command="{label}"}} {stats.latency.count}')
+    lines.append("# TYPE citadel_command_errors_total counter")
+    lines += [f'citadel_command_errors_total{{command="{label}"}} {stats.errors}' for label, stats in rows]
+    lines.append("# TYPE citadel_command_rest_seconds_total counter")
+    lines += [f'citadel_command_rest_seconds_total{{command="{label}"}} {stats.rest:.6f}' for label, stats in rows]
+    lines.append("# TYPE citadel_command_local_seconds_total counter")
+    lines += [f'citadel_command_local_seconds_total{{command="{label}"}} {stats.local:.6f}' for label, stats in rows]
+    lines.append("# TYPE citadel_loop_lag_seconds histogram")
+    cumulative = 0
+    for bound, count in zip(BUCKETS, loop_lag.counts):
+        cumulative += count
+        le = "+Inf" if bound == float('inf') else f"{bound:g}"
+        lines.append(f'citadel_loop_lag_seconds_bucket{{le="{le}"}} {cumulative}')
+    lines.append(f"citadel_loop_lag_seconds_sum {loop_lag.total:.6f}")
+    lines.append(f"citadel_loop_lag_seconds_count {loop_lag.count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,75 @@
+import asyncio
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import time
+import tracemalloc
+
+class ProfileReport:
+    def __init__(self, result, elapsed, profiler, allocations, stalls, worst_stall):
+        self.result = result
+        self.elapsed = elapsed
+        self.profiler = profiler
+        self.allocations = allocations
+        self.stalls = stalls
+        self.worst_stall = worst_stall
+
+    def top_functions(self, n=10):
+        stats = pstats.Stats(self.profiler).stats
+        rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:n]
+        return [
+            f"{ct * 1000:8.1f} ms {nc:>6} {func} ({os.path.basename(filename)}:{line})"
+            for (filename, line, func), (_, nc, _, ct, _) in rows
+        ]
+
+    def top_allocations(self, n=5):
+        return [
+            f"{stat.size_diff / 1024:8.1f} KiB {stat.count_diff:>6} {os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}"
+            for stat in self.allocations[:n]
+        ]
+
+    def pstats_text(self):
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats('cumulative').print_stats()
+        return stream.getvalue()
+
+    def pstats_dump(self):
+        """Same format as ``Stats.dump_stats``, loadable with ``pstats.Stats(path)``."""
+        self.profiler.create_stats()
+        return marshal.dumps(self.profiler.stats)
+
+async def profile(coro_factory, stall_threshold=0.05, sample_interval=0.01):
+    """Awaits ``coro_factory()`` under cProfile and tracemalloc while counting event-loop stalls."""
+    loop = asyncio.get_running_loop()
+    stalls = [0, 0.0]
+
+    async def sample():
+        while True:
+            before = loop.time()
+            await asyncio.sleep(sample_interval)
+            lag = loop.time() - before - sample_interval
+            if lag > stall_threshold:
+                stalls[0] += 1
+                stalls[1] = max(stalls[1], lag)
+
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    snapshot = tracemalloc.take_snapshot()
+    sampler = asyncio.create_task(sample())
+    await asyncio.sleep(0)
+    profiler = cProfile.Profile()
+    start = time.monotonic()
+    profiler.enable()
+    try:
+        result = await coro_factory()
+    finally:
+        profiler.disable()
+        elapsed = time.monotonic() - start
+        sampler.cancel()
+        allocations = tracemalloc.take_snapshot().compare_to(snapshot, 'lineno')
+        if not tracing:
+            tracemalloc.stop()
+    return ProfileReport(result, elapsed, profiler, allocations, stalls[0], stalls[1])
@@ -0,0 +1,72 @@
+from collections import deque
+
+class _GuildWindow:
+    __slots__ = ('messages', 'authors', 'joins')
+
+    def __init__(self):
+        self.messages = deque()  # (timestamp, fingerprint, author_id)
+        self.authors = {}  # fingerprint -> {author_id: messages in window}
+        self.joins = deque()  # (timestamp, member_id)
+
+class RaidDetector:
+    """Sliding-window duplicate-message and join-rate detection.
+
+    Each guild keeps at most ``max_messages`` fingerprints and ``join_threshold``
+    joins, so memory stays flat however busy the guild is. Every event is O(1)
+    amortised: it is appended once and evicted once.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._guilds = {}
+
+    def _window(self, guild_id):
+        window = self._guilds.get(guild_id)
+        if window is None:
+            window = self._guilds[guild_id] = _GuildWindow()
+        return window
+
+    def _evict(self, window, now):
+        horizon = now - self.config.window_seconds
+        messages, authors = window.messages, window.authors
+        while messages and (messages[0][0] < horizon or len(messages) > self.config.max_messages):
+            _, fingerprint, author_id = messages.popleft()
+            counts = authors[fingerprint]
+            if counts[author_id] == 1:
+                del counts[author_id]
+                if not counts:
+                    del authors[fingerprint]
+            else:
+                counts[author_id] -= 1
+
+    def message(self, guild_id, author_id, content, now):
+        """Records a message given its normalised ``content``. Returns (fingerprint, author_ids)
+        once it has been posted by ``duplicate_authors`` distinct accounts, else None."""
+        if len(content) < self.config.min_length:
+            return None
+        fingerprint = hash(content)
+        window = self._window(guild_id)
+        window.messages.append((now, fingerprint, author_id))
+        counts = window.authors.setdefault(fingerprint, {})
+        counts[author_id] = counts.get(author_id, 0) + 1
+        self._evict(window, now)
+
+        counts = window.authors.get(fingerprint)
+        if counts and len(counts) >= self.config.duplicate_authors:
+            return fingerprint, list(counts)
+        return None
+
+    def join(self, guild_id, member_id, now):
+        """Records a join. Returns the recent joiners once ``join_threshold`` members
+        joined within ``join_window_seconds``, else None."""
+        joins = self._window(guild_id).joins
+        joins.append((now, member_id))
+        horizon = now - self.config.join_window_seconds
+        while joins and (joins[0][0] < horizon or len(joins) > self.config.join_threshold):
+            joins.popleft()
+        if len(joins) >= self.config.join_threshold:
+            return [member_id for _, member_id in joins]
+        return None
+
+    def forget(self, guild_id):
+        self._guilds.pop(guild_id, None)
@@ -0,0 +1,46 @@
+import asyncio
+import time
+import discord
+from utils.members import ensure_chunked
+
+CONCURRENCY = 5
+PROGRESS_INTERVAL = 2.0
+
+async def plan(guild, role, user_ids, members_intent):
+    """Diffs ``user_ids`` against the current holders of ``role``, chunking the guild
+    first if ``members_intent`` allows. Returns the members to give the role to and
+    the members to take it from."""
+    await ensure_chunked(guild, members_intent)
+    wanted = {int(user_id) for user_id in user_ids}
+    holders = {member.id for member in role.members}
+    to_add = [member for member in map(guild.get_member, wanted - holders) if member is not None]
+    to_remove = [member for member in role.members if member.id not in wanted]
+    return to_add, to_remove
+
+async def apply(rest, role, to_add, to_remove, progress=None):
+    """Applies a plan through the REST scheduler with at most ``CONCURRENCY`` edits in flight.
+    ``progress(done, total, failed)`` is awaited at most every ``PROGRESS_INTERVAL`` seconds
+    and once at the end. Returns the number of failed edits."""
+    total = len(to_add) + len(to_remove)
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    state = {'done': 0, 'failed': 0, 'reported': time.monotonic()}
+
+    async def edit(member, present):
+        async with semaphore:
+            try:
+                await rest.set_role(member, role, present, reason="Participant list reconciliation")
+            except discord.HTTPException:
+                state['failed'] += 1
+        state['done'] += 1
+        now = time.monotonic()
+        if progress and now - state['reported'] >= PROGRESS_INTERVAL:
+            state['reported'] = now
+            await progress(state['done'], total, state['failed'])
+
+    await asyncio.gather(
+        *(edit(member, True) for member in to_add),
+        *(edit(member, False) for member in to_remove),
+    )
+    if progress:
+        await progress(state['done'], total, state['failed'])
+    return state['failed']
@@ -0,0 +1,17 @@
+import asyncio
+import discord
+
+async def retry(factory, attempts=3, base_delay=0.5):
+    """Awaits ``factory()``, retrying transient HTTP failures with exponential backoff.
+
+    Forbidden and NotFound are raised straight away since retrying can't fix them.
+    """
+    for attempt in range(attempts):
+        try:
+            return await factory()
+        except (discord.Forbidden, discord.NotFound):
+            raise
+        except (discord.HTTPException, asyncio.TimeoutError):
+            if attempt == attempts - 1:
+                raise
+            await asyncio.sleep(base_delay * 2 ** attempt)
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import os
+from utils.files import atomic_write
+
+SNAPSHOT_FILE = 'list.json'
+JOURNAL_FILE = 'cache/roster.journal'
+
+class RegistrationClosed(Exception):
+    """Raised by ``Roster.add`` while registration is closed or the roster is full."""
+
+class Roster:
+    """Event participants kept in memory as an ordered set.
+
+    Every change is appended to a journal, and the full list is periodically
+    written to ``list.json`` through a temp file + ``os.replace`` so the
+    snapshot is never half-written. On load the journal is replayed on top of
+    the last snapshot; a ``!`` line (written by ``replace``) clears the roster.
+
+    ``closed`` and ``capacity`` are set by the event lifecycle and checked
+    under the lock, so a burst of clicks can't overfill the event.
+    """
+
+    def __init__(self, snapshot_file=SNAPSHOT_FILE, journal_file=JOURNAL_FILE):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.lock = asyncio.Lock()
+        self.ready = asyncio.Event()
+        self._participants = {}
+        self._journal = None
+        self._dirty = False
+        self.closed = False
+        self.capacity = None
+
+    @property
+    def full(self):
+        return self.capacity is not None and len(self._participants) >= self.capacity
+
+    def __contains__(self, user_id):
+        return str(user_id) in self._participants
+
+    def __len__(self):
+        return len(self._participants)
+
+    def __iter__(self):
+        return iter(list(self._participants))
+
+    def to_list(self):
+        return list(self._participants)
+
+    async def load(self):
+        await asyncio.to_thread(self._load)
+        self.ready.set()
+
+    def _load(self):
+        try:
+            with open(self.snapshot_file, 'r') as file:
+                user_list = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            user_list = []
+        if not isinstance(user_list, list):
+            user_list = []
+        self._participants = dict.fromkeys(str(user_id) for user_id in user_list)
+
+        try:
+            with open(self.journal_file, 'r') as journal:
+                for line in journal:
+                    op, user_id = line[:1], line[1:].strip()
+                    if op == '!':
+                        self._participants.clear()
+                        self._dirty = True
+                        continue
+                    if not user_id:
+                        continue
+                    if op == '+':
+                        self._participants.setdefault(user_id, None)
+                    elif op == '-':
+                        self._participants.pop(user_id, None)
+                    self._dirty = True
+        except FileNotFoundError:
+            pass
+
+        os.makedirs(os.path.dirname(self.journal_file) or '.', exist_ok=True)
+        self._journal = open(self.journal_file, 'a')
+
+    def _append(self, op, user_id):
+        self._journal.write(f"{op}{user_id}\n")
+        self._journal.flush()
+        self._dirty = True
+
+    async def add(self, user_id):
+        """Registers ``user_id``. Returns False if they were already registered and
+        raises RegistrationClosed if registration is closed or full."""
+        user_id = str(user_id)
+        async with self.lock:
+            if user_id in self._participants:
+                return False
+            if self.closed or self.full:
+                raise RegistrationClosed("full" if self.full else "closed")
+            self._participants[user_id] = None
+            self._append('+', user_id)
+            return True
+
+    async def remove(self, user_id):
+        """Unregisters ``user_id``. Returns False if they were not registered."""
+        user_id = str(user_id)
+        async with self.lock:
+            if user_id not in self._participants:
+                return False
+            del self._participants[user_id]
+            self._append('-', user_id)
+            return True
+
+    async def replace(self, new_list):
+        async with self.lock:
+            self._participants = dict.fromkeys(str(user_id) for user_id in new_list)
+            # journal the whole new list behind a reset marker first: if the process dies
+            # before the journal is truncated, replay still ends at the new list instead of
+            # re-adding the old entries on top of it
+            await asyncio.to_thread(self._write_reset, self.to_list())
+            self._dirty = True
+            await self._snapshot()
+
+    def _write_reset(self, user_list):
+        self._journal.write("!\n" + "".join(f"+{user_id}\n" for user_id in user_list))
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    async def snapshot(self):
+        """Writes the snapshot and truncates the journal, if anything changed."""
+        async with self.lock:
+            if self._dirty:
+                await self._snapshot()
+
+    async def _snapshot(self):
+        await asyncio.to_thread(self._write_snapshot, self.to_list())
+        self._journal.truncate(0)
+        self._journal.seek(0)
+        self._dirty = False
+
+    def _write_snapshot(self, user_list):
+        atomic_write(self.snapshot_file, json.dumps(user_list, indent=4), sync=True)
+
+    async def close(self):
+        await self.snapshot()
+        if self._journal:
+            self._journal.close()
+            self._journal = None
@@ -0,0 +1,242 @@
+import asyncio
+import contextvars
+import itertools
+import time
+from collections import defaultdict, deque
+import discord
+from utils.rest import retry
+from utils import metrics
+
+MODERATION, ROLES, LOGGING = 0, 1, 2
+LANES = {MODERATION: 'moderation', ROLES: 'roles', LOGGING: 'logging'}
+
+# how many requests may be in flight at once per bucket kind
+BUCKET_LIMITS = {'ban': 5, 'member': 1, 'channel': 2}
+BULK_BAN_LIMIT = 200  # users per bulk ban request
+
+class SchedulerClosed(Exception):
+    """The scheduler was closed before the job ran or finished."""
+
+class _Job:
+    __slots__ = ('lane', 'seq', 'bucket', 'factory', 'key', 'future', 'enqueued_at', 'rest')
+
+    def __init__(self, lane, seq, bucket, factory, key, future):
+        self.lane = lane
+        self.seq = seq
+        self.bucket = bucket
+        self.factory = factory
+        self.key = key
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.rest = metrics.current_rest()
+
+    def __lt__(self, other):
+        return (self.lane, self.seq) < (other.lane, other.seq)
+
+class LaneStats:
+    __slots__ = ('depth', 'submitted', 'completed', 'failed', 'coalesced', 'total_wait', 'max_wait')
+
+    def __init__(self):
+        self.depth = 0
+        self.submitted = self.completed = self.failed = self.coalesced = 0
+        self.total_wait = self.max_wait = 0.0
+
+    def as_dict(self):
+        done = self.completed + self.failed
+        return {
+            'depth': self.depth,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'coalesced': self.coalesced,
+            'avg_wait_ms': self.total_wait / done * 1000 if done else 0.0,
+            'max_wait_ms': self.max_wait * 1000,
+        }
+
+class RestScheduler:
+    """Runs outbound REST calls in priority order (moderation > roles > logging).
+
+    Each call belongs to a bucket such as ``('ban', guild_id)``. A bucket that is
+    already at its concurrency budget parks further jobs instead of tying up a
+    worker, so a burst of role edits can never hold back a ban. Jobs submitted
+    with the same ``key`` while still queued are coalesced: the latest factory wins.
+    """
+
+    def __init__(self, workers=10):
+        self.worker_count = workers
+        self.queue = asyncio.PriorityQueue()
+        self.stats = {lane: LaneStats() for lane in LANES}
+        self._seq = itertools.count()
+        self._pending = {}
+        self._active = defaultdict(int)
+        self._parked = defaultdict(deque)
+        self._workers = []
+
+    def submit(self, lane, bucket, factory, key=None):
+        stats = self.stats[lane]
+        stats.submitted += 1
+        if key is not None and key in self._pending:
+            job = self._pending[key]
+            job.factory = factory
+            stats.coalesced += 1
+            return job.future
+
+        job = _Job(lane, next(self._seq), bucket, factory, key, asyncio.get_running_loop().create_future())
+        if key is not None:
+            self._pending[key] = job
+        stats.depth += 1
+        self.queue.put_nowait(job)
+        self._start()
+        return job.future
+
+    def _failed(self, lane, error):
+        """A future that already failed with ``error``, for calls rejected before submission."""
+        self.stats[lane].submitted += 1
+        self.stats[lane].failed += 1
+        future = asyncio.get_running_loop().create_future()
+        future.set_exception(error)
+        return future
+
+    def ban(self, guild, user, **kwargs):
+        return self.submit(MODERATION, ('ban', guild.id), lambda: guild.ban(user, **kwargs))
+
+    def bulk_ban(self, guild, users, **kwargs):
+        return self.submit(MODERATION, ('ban', guild.id), lambda: guild.bulk_ban(users, **kwargs))
+
+    async def ban_users(self, guild, user_ids, reason=None):
+        """Bans through the bulk endpoint in batches of ``BULK_BAN_LIMIT``, retrying failed
+        batches one by one (except on Forbidden, which a retry can't fix).
+        Returns the number of banned users and the IDs that could not be banned."""
+        batches = [user_ids[i:i + BULK_BAN_LIMIT] for i in range(0, len(user_ids), BULK_BAN_LIMIT)]
+        results = await asyncio.gather(
+            *(self.bulk_ban(guild, [discord.Object(id=user_id) for user_id in batch], reason=reason) for batch in batches),
+            return_exceptions=True,
+        )
+
+        banned = 0
+        retry_ids = []
+        failed = []
+        for batch, result in zip(batches, results):
+            if isinstance(result, discord.Forbidden):
+                failed.extend(batch)  # missing permissions: banning one by one would fail the same way
+            elif isinstance(result, discord.HTTPException):
+                retry_ids.extend(batch)
+            elif isinstance(result, Exception):
+                raise result
+            else:
+                banned += len(result.banned)
+                retry_ids.extend(user.id for user in result.failed)
+
+        results = await asyncio.gather(
+            *(self.ban(guild, discord.Object(id=user_id), reason=reason) for user_id in retry_ids),
+            return_exceptions=True,
+        )
+        for user_id, result in zip(retry_ids, results):
+            if isinstance(result, discord.HTTPException):
+                failed.append(user_id)
+            elif isinstance(result, Exception):
+                raise result
+            else:
+                banned += 1
+        return banned, failed
+
+    def set_role(self, member, role, present, reason=None, lane=ROLES):
+        """Adds or removes ``role``. Repeated edits of the same member/role collapse into the last one.
+        A missing ``role`` (e.g. deleted, or not configured) fails the returned future rather than raising here."""
+        if role is None:
+            return self._failed(lane, LookupError("role not found"))
+        if present:
+            factory = lambda: member.add_roles(role, reason=reason)
+        else:
+            factory = lambda: member.remove_roles(role, reason=reason)
+        key = ('role', member.guild.id, member.id, role.id)
+        return self.submit(lane, ('member', member.guild.id, member.id), factory, key=key)
+
+    def send(self, channel, *args, lane=LOGGING, **kwargs):
+        if channel is None:
+            return self._failed(lane, LookupError("channel not found"))
+        return self.submit(lane, ('channel', channel.id), lambda: channel.send(*args, **kwargs))
+
+    def _start(self):
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        while len(self._workers) < self.worker_count:
+            # workers get a fresh context so they never inherit the submitting command's metrics
+            self._workers.append(asyncio.create_task(self._worker(), context=contextvars.Context()))
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            limit = BUCKET_LIMITS.get(job.bucket[0], 1)
+            if self._active[job.bucket] >= limit:
+                self._parked[job.bucket].append(job)
+                continue
+            await self._run(job)
+
+    async def _run(self, job):
+        if job.key is not None and self._pending.get(job.key) is job:
+            del self._pending[job.key]
+        stats = self.stats[job.lane]
+        stats.depth -= 1
+        wait = time.monotonic() - job.enqueued_at
+        stats.total_wait += wait
+        stats.max_wait = max(stats.max_wait, wait)
+
+        self._active[job.bucket] += 1
+        started = time.perf_counter()
+        try:
+            result = await retry(job.factory)
+        except asyncio.CancelledError:
+            # the worker was cancelled by close(): don't leave the caller waiting
+            stats.failed += 1
+            if not job.future.done():
+                job.future.set_exception(SchedulerClosed())
+            raise
+        except Exception as e:
+            stats.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            stats.completed += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            if job.rest is not None:
+                job.rest[0] += time.perf_counter() - started
+            self._active[job.bucket] -= 1
+            if not self._active[job.bucket]:
+                del self._active[job.bucket]
+            parked = self._parked.get(job.bucket)
+            if parked:
+                self.queue.put_nowait(parked.popleft())
+                if not parked:
+                    del self._parked[job.bucket]
+
+    def snapshot(self):
+        return {LANES[lane]: stats.as_dict() for lane, stats in self.stats.items()}
+
+    def close(self):
+        """Stops the workers and fails every queued, parked or running job with
+        ``SchedulerClosed``. A later ``submit`` starts new workers."""
+        for worker in self._workers:
+            worker.cancel()  # running jobs fail in _run
+        self._workers.clear()
+        jobs = []
+        while not self.queue.empty():
+            jobs.append(self.queue.get_nowait())
+        for parked in self._parked.values():
+            jobs.extend(parked)
+        self._parked.clear()
+        self._pending.clear()
+        for job in jobs:
+            stats = self.stats[job.lane]
+            stats.depth -= 1
+            stats.failed += 1
+            if not job.future.done():
+                job.future.set_exception(SchedulerClosed())
+
+def get(bot):
+    """Returns the bot-wide scheduler, creating it on first use."""
+    scheduler = getattr(bot, 'rest_scheduler', None)
+    if scheduler is None:
+        scheduler = bot.rest_scheduler = RestScheduler()
+    return scheduler
@@ -0,0 +1,185 @@
+import os
+import traceback
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping
+import yaml
+from utils.join_gate import compile_names
+
+SETTINGS_FILE = 'settings.yaml'
+
+@dataclass(frozen=True)
+class RaidDetection:
+    enabled: bool = True
+    window_seconds: float = 30
+    duplicate_authors: int = 5
+    min_length: int = 10
+    max_messages: int = 5000
+    join_window_seconds: float = 60
+    join_threshold: int = 15
+    action: str = 'alert'
+    quarantine_role: int = None
+    slowmode_seconds: int = 30
+    cooldown_seconds: float = 300
+
+@dataclass(frozen=True)
+class JoinGateConfig:
+    enabled: bool = True
+    blocklist_file: str = 'cache/blocklist.txt'
+    blocklist_action: str = 'ban'  # every action is 'ban', 'kick', 'quarantine' or None (rule off)
+    name_patterns: tuple = ()
+    name_action: str = None
+    min_account_age_hours: float = 0
+    account_age_action: str = None
+    default_avatar_action: str = None
+    burst_joins: int = 0
+    burst_window_seconds: float = 10
+    burst_action: str = None
+    quarantine_role: int = None
+    batch_seconds: float = 2
+
+def parse_join_gate(data):
+    data = dict(data or {})
+    data['name_patterns'] = tuple(data.get('name_patterns') or ())
+    compile_names(data['name_patterns'])  # a bad regex rejects the reload instead of breaking the gate
+    return JoinGateConfig(**data)
+
+@dataclass(frozen=True)
+class MessageIndexing:
+    default_capacity: int = 1000
+    channels: Mapping[int, int] = field(default_factory=lambda: MappingProxyType({}))
+    max_entries: int = 100_000
+
+@dataclass(frozen=True)
+class StallWatchdog:
+    enabled: bool = True
+    threshold_ms: float = 500
+    report_interval_seconds: float = 300
+
+@dataclass(frozen=True)
+class GatewayProfile:
+    intents: object = 'all'  # 'all' or a tuple of discord.Intents flag names
+    member_cache: object = 'all'  # 'all' or a tuple of discord.MemberCacheFlags names
+    max_messages: int = 1000
+    chunk_guilds_at_startup: bool = True
+
+@dataclass(frozen=True)
+class ClusterConfig:
+    shards: object = None  # None (one connection), 'auto' or a shard count
+    processes: int = 1
+    home_guild: int = None
+    socket: str = 'cache/cluster.sock'
+
+def parse_profile(data):
+    data = dict(data or {})
+    for key in ('intents', 'member_cache'):
+        if isinstance(data.get(key), list):
+            data[key] = tuple(data[key])
+    return GatewayProfile(**data)
+
+@dataclass(frozen=True)
+class Settings:
+    prefix: str
+    developer: frozenset
+    allowed_servers: frozenset
+    bug_reports_channel: int
+    raid_alerts_channel: int
+    participant_role: int
+    registration_log: int
+    role_levels: Mapping[int, int]
+    event_team: frozenset
+    massban_channels: tuple
+    massban_scan_depth: int
+    raid_detection: RaidDetection
+    join_gate: JoinGateConfig
+    message_index: MessageIndexing
+    watchdog: StallWatchdog
+    gateway_profile: str
+    gateway_profiles: Mapping[str, GatewayProfile]
+    cluster: ClusterConfig
+
+def parse(data):
+    log_channels = data.get('log_channels') or {}
+    event_settings = data.get('event_settings') or {}
+    anti_raid = data.get('anti_raid') or {}
+    massban = anti_raid.get('massban') or {}
+    message_index = anti_raid.get('message_index') or {}
+    gateway = data.get('gateway') or {}
+    return Settings(
+        prefix=data.get('prefix', '!'),
+        developer=frozenset(data.get('developer') or []),
+        allowed_servers=frozenset(data.get('allowed_servers') or []),
+        bug_reports_channel=log_channels.get('bug_reports'),
+        raid_alerts_channel=log_channels.get('raid_alerts') or log_channels.get('bug_reports'),
+        participant_role=event_settings.get('participant_role'),
+        registration_log=event_settings.get('registration_log'),
+        role_levels=MappingProxyType(dict(data.get('role_levels') or {})),
+        event_team=frozenset(data.get('event_team') or []),
+        massban_channels=tuple(massban.get('channels') or []),
+        massban_scan_depth=massban.get('scan_depth', 500),
+        raid_detection=RaidDetection(**(anti_raid.get('detection') or {})),
+        join_gate=parse_join_gate(anti_raid.get('join_gate')),
+        message_index=MessageIndexing(
+            default_capacity=message_index.get('default_capacity', 1000),
+            channels=MappingProxyType(dict(message_index.get('channels') or {})),
+            max_entries=message_index.get('max_entries', 100_000),
+        ),
+        watchdog=StallWatchdog(**(data.get('watchdog') or {})),
+        gateway_profile=gateway.get('profile', 'full'),
+        gateway_profiles=MappingProxyType({name: parse_profile(profile) for name, profile in (gateway.get('profiles') or {}).items()}),
+        cluster=ClusterConfig(**(data.get('cluster') or {})),
+    )
+
+_current = None
+_mtime = None
+_subscribers = []
+error = None  # why the last reload was rejected, if it was
+
+def get():
+    """Returns the current settings. Never touches the disk once loaded."""
+    if _current is None:
+        reload(force=True)
+    return _current
+
+def gateway_profile(name=None):
+    """The named gateway profile, or the one selected by ``gateway.profile``."""
+    current = get()
+    return current.gateway_profiles.get(name or current.gateway_profile, GatewayProfile())
+
+def reload(force=False):
+    """Re-parses settings.yaml if its mtime changed (or ``force``) and
+    notifies subscribers. Returns True if new settings were applied.
+
+    A file that doesn't parse (YAML syntax, unknown or mistyped keys) is
+    logged and ignored, and the previous settings stay in effect; ``error``
+    says why. Only the very first load raises, as there is nothing to keep.
+    """
+    global _current, _mtime, error
+    mtime = None
+    try:
+        mtime = os.stat(SETTINGS_FILE).st_mtime_ns
+        if not force and mtime == _mtime:
+            return False
+        with open(SETTINGS_FILE, 'r') as file:
+            new = parse(yaml.safe_load(file) or {})
+    except (OSError, yaml.YAMLError, TypeError, ValueError, AttributeError) as e:
+        if _current is None:
+            raise
+        if mtime is not None:
+            _mtime = mtime  # don't log the same broken file on every check
+        error = f"{type(e).__name__}: {e}"
+        print(f"[-] settings.yaml not applied, keeping the previous settings: {error}")
+        return False
+    _current, _mtime, error = new, mtime, None
+    for callback in list(_subscribers):
+        try:
+            callback(new)
+        except Exception:
+            traceback.print_exc()
+    return True
+
+def subscribe(callback):
+    """Calls ``callback(settings)`` now and after every reload."""
+    _subscribers.append(callback)
+    callback(get())
+    return callback
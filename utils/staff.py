@@ -1,21 +1,56 @@
-import discord
-import yaml
 from discord import Interaction
+from discord.ext import commands
+from utils import settings
 
-with open('settings.yaml', 'r') as yamlfile:
-    settings = yaml.safe_load(yamlfile)
-    role_levels = settings.get('role_levels', {})
-    event_team = settings.get('event_team', [])
-    staff_role_ids = list(role_levels.keys())
-    developer = settings['developer']
+developer = frozenset()
+event_team = frozenset()
+staff_role_ids = frozenset()
+role_levels = {}
+
+# (guild_id, member_id) -> effective level, dropped by commands/permissions.py on role
+# changes. Only members in the client's cache are kept: discord.py dispatches
+# on_member_update for those alone, so anyone else's level could go stale.
+_levels = {}
+
+@settings.subscribe
+def _apply_settings(new):
+    global developer, event_team, staff_role_ids, role_levels
+    developer, event_team = new.developer, new.event_team
+    staff_role_ids, role_levels = frozenset(new.role_levels), dict(new.role_levels)
+    _levels.clear()
+
+def member_level(member):
+    """Highest ``role_levels`` value among the member's roles (0 if none)."""
+    guild = getattr(member, 'guild', None)
+    if guild is None:
+        return 0
+    key = (guild.id, member.id)
+    level = _levels.get(key)
+    if level is not None:
+        return level
+    level = max((role_levels.get(role.id, 0) for role in member.roles), default=0)
+    if guild.get_member(member.id) is not None:
+        _levels[key] = level
+    return level
+
+def invalidate(guild_id, member_id=None):
+    if member_id is not None:
+        _levels.pop((guild_id, member_id), None)
+    else:
+        for key in [key for key in _levels if key[0] == guild_id]:
+            del _levels[key]
+
+def requires_level(level):
+    def predicate(ctx):
+        return member_level(ctx.author) >= level
+    return commands.check(predicate)
 
 def is_dev(ctx):
     return ctx.author.id in developer
-    
+
 def is_staff(ctx):
-    user_role_ids = [role.id for role in ctx.author.roles]
-    return any(role_id in staff_role_ids for role_id in user_role_ids)
+    return member_level(ctx.author) > 0
 
 async def is_event_team(interaction: Interaction):
     return interaction.user.id in event_team
-  
+
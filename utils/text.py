@@ -0,0 +1,10 @@
+import re
+
+ZERO_WIDTH = dict.fromkeys(map(ord, '\u200b\u200c\u200d\u200e\u200f\u2060\ufeff\u00ad'))
+INVITE_RE = re.compile(r'(?:https?://)?(?:www\.)?(?:discord(?:app)?\.com/invite|discord\.gg|dsc\.gg)/[\w-]+', re.IGNORECASE)
+
+def normalise(content):
+    """Lowercases, drops zero-width characters and invite links, and collapses whitespace,
+    so small variations of the same raid message compare equal."""
+    content = INVITE_RE.sub('', content.translate(ZERO_WIDTH))
+    return ' '.join(content.casefold().split())
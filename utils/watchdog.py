@@ -0,0 +1,69 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from utils import metrics
+
+class Watchdog:
+    """Detects event-loop stalls and captures what the loop thread was running.
+
+    A heartbeat task on the loop records every tick (and its lag into
+    ``metrics.loop_lag``); a monitor thread notices when the heartbeat falls
+    more than ``threshold`` seconds behind and grabs the loop thread's stack
+    while it is still stuck.
+    """
+
+    def __init__(self, threshold=0.5, interval=0.1, report_interval=300, on_stall=None):
+        self.threshold = threshold
+        self.interval = interval
+        self.report_interval = report_interval
+        self.on_stall = on_stall
+        self.stalls = 0
+        self.loop = None
+        self._thread_id = None
+        self._last_beat = time.monotonic()
+        self._last_report = 0.0
+        self._heartbeat = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._heartbeat = self.loop.create_task(self._beat())
+        threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        if self._heartbeat:
+            self._heartbeat.cancel()
+
+    async def _beat(self):
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._last_beat = now = time.monotonic()
+            metrics.loop_lag.observe(max(now - before - self.interval, 0.0))
+
+    def _monitor(self):
+        stalled_since = None
+        while not self._stop.wait(self.interval):
+            beat = self._last_beat
+            behind = time.monotonic() - beat
+            if behind <= self.threshold:
+                stalled_since = None
+                continue
+            if stalled_since == beat:
+                continue
+            stalled_since = beat
+            self.stalls += 1
+            frame = sys._current_frames().get(self._thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<no frame>"
+            print(f"[!] event loop stalled for {behind * 1000:.0f} ms, loop thread was at:\n{stack}")
+
+            now = time.monotonic()
+            if self.on_stall and now - self._last_report >= self.report_interval:
+                self._last_report = now
+                asyncio.run_coroutine_threadsafe(self.on_stall(behind, stack), self.loop)
@@ -1,15 +1,76 @@
-from flask import Flask
-from threading import Thread
+import os
+import time
+import discord
+from aiohttp import web
+from utils import metrics
 
-app = Flask('')
+class HealthServer:
+    """Health endpoints served from the bot's own event loop.
 
-@app.route('/')
-def home():
-    return "Copy the url and create a cron-job service."
+    A stuck loop can't answer at all, so the orchestrator sees a timeout
+    instead of a cheerful "up" from a side thread.
+    """
 
-def run():
-    app.run(host='0.0.0.0', port=8080)
+    def __init__(self, bot, host='0.0.0.0', port=None):
+        self.bot = bot
+        self.host = host
+        self.port = port or int(os.environ.get('PORT', 8080))
+        self.ready = False
+        self.runner = None
+        self.app = web.Application()
+        self.app.router.add_get('/', self.home)
+        self.app.router.add_get('/healthz', self.healthz)
+        self.app.router.add_get('/readyz', self.readyz)
+        self.app.router.add_get('/metrics', self.metrics)
 
-def keep_alive():
-    t = Thread(target=run)
-    t.start()               
+    async def start(self):
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+
+    async def close(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    def socket_status(self, ws):
+        keep_alive = getattr(ws, '_keep_alive', None)
+        last_ack = getattr(keep_alive, '_last_ack', None)
+        interval = getattr(keep_alive, 'interval', None)
+        since_heartbeat = time.perf_counter() - last_ack if last_ack else None
+        connected = ws is not None and ws.open and not self.bot.is_closed()
+        healthy = connected and (since_heartbeat is None or interval is None or since_heartbeat < interval * 2)
+        return {
+            'healthy': healthy,
+            'connected': connected,
+            'since_heartbeat_ack_s': round(since_heartbeat, 2) if since_heartbeat is not None else None,
+            'heartbeat_interval_s': interval,
+        }
+
+    def status(self):
+        latency = self.bot.latency
+        status = {
+            'latency_ms': round(latency * 1000, 1) if latency == latency and latency != float('inf') else None,
+            'extensions': sorted(self.bot.extensions),
+        }
+        if isinstance(self.bot, discord.AutoShardedClient):
+            # one websocket per shard; healthy only if every shard is
+            shards = {shard_id: self.socket_status(self.bot.get_shard(shard_id)._parent.ws) for shard_id in sorted(self.bot.shards)}
+            status['shards'] = shards
+            status['healthy'] = bool(shards) and all(shard['healthy'] for shard in shards.values())
+            status['connected'] = bool(shards) and all(shard['connected'] for shard in shards.values())
+        else:
+            status.update(self.socket_status(self.bot.ws))
+        return status
+
+    async def home(self, request):
+        return web.Response(text="Copy the url and create a cron-job service.")
+
+    async def healthz(self, request):
+        status = self.status()
+        return web.json_response(status, status=200 if status['healthy'] else 503)
+
+    async def readyz(self, request):
+        return web.json_response({'ready': self.ready}, status=200 if self.ready else 503)
+
+    async def metrics(self, request):
+        return web.Response(text=metrics.render(), content_type='text/plain')